@@ -1,12 +1,14 @@
-from flask import Flask, request, jsonify, send_from_directory
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, g
+import click
 import os
 import sys
-from werkzeug.security import generate_password_hash, check_password_hash
 import mysql.connector
-import base64, re, cv2
-import numpy as np
-from deepface import DeepFace
-import csv
+import binascii
+from datetime import datetime, timedelta
+from concurrent.futures import TimeoutError as FutureTimeout, wait as futures_wait
 from dotenv import load_dotenv
 
 # Load variables from .env when running locally
@@ -14,50 +16,6 @@ load_dotenv()
 
 HF_API_KEY = os.getenv("HF_API_KEY")
 
-# Sample resource data (later you can load from DB if needed)
-RESOURCES = [
-    {
-        "title": "Stress Management Guide (Hindi)",
-        "description": "Practical PDF guide in Hindi for reducing stress.",
-        "type": "pdf",
-        "url": "/static/resources/stress_guide_hindi.pdf",
-        "language": "Hindi"
-    },
-    {
-        "title": "Guided Meditation (English)",
-        "description": "10-minute meditation audio in English.",
-        "type": "audio",
-        "url": "/static/resources/meditation.mp3",
-        "language": "English"
-    },
-    {
-        "title": "Stress Tips (English)",
-        "description": "Quick stress relief techniques in English (PDF).",
-        "type": "pdf",
-        "url": "/static/resources/stress_tips_english.pdf",
-        "language": "English"
-    },
-    {
-        "title": "Relaxing Music (Universal)",
-        "description": "Calming instrumental music for relaxation.",
-        "type": "audio",
-        "url": "/static/resources/calm_music.mp3",
-        "language": "Universal"
-    },
-    {
-        "title": "Understanding Anxiety (Video)",
-        "description": "Educational video explaining anxiety and coping strategies.",
-        "type": "video",
-        "url": "https://www.youtube.com/embed/2ZKN5bFsY3M",
-        "language": "English"
-    }
-]
-
-
-
-
-
-
 # -----------------------------
 # Setup paths
 # -----------------------------
@@ -65,22 +23,122 @@ BASE = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE)
 STATIC_DIR = os.path.join(BASE, "static")
 
+from backend.services.db_pool import pool_from_env
+from backend.services import peer_feed, peer_events
+from backend.services.emotion_service import service_from_env, QueueFull
+from backend.services.model_registry import MODELS
+from backend.services.sentiment import SentimentScorer
+from backend.services.rules import RuleSet
+from backend.services.write_behind import WriteBehindBuffer
+from backend.services import rollups
+from backend.services import reactions
+from backend.services.mood_windows import MoodWindows
+from backend.services.metrics import Metrics, SamplingProfiler, save_profile
+from backend.services import migrations
+from backend.services.contacts import ContactsCatalog
+from backend.services.resources import ResourceCatalog
+from backend.services.static_assets import StaticAssets, build as build_static
+from backend.services.password_hasher import hasher_from_env, HasherBusy, HasherTimeout
+from backend.services.user_cache import user_cache_from_env, email_key, username_key
+from backend.services.history import CHAT_HISTORY, QUESTIONNAIRE_HISTORY, RecentHistory, make_etag, etag_matches
+from backend.services.frames import frame_from_request, FrameError, FrameTooLarge
+from backend.services.preprocess import preprocessor_from_env, StageTimer
+from backend.services.emotion_sessions import sessions_from_env, iter_framed, SessionNotFound
+from backend.services import inference  # registers the joblib risk model (loaded lazily)
+
 # -----------------------------
-# Sentiment Analyzer (VADER)
+# Models: registered here, loaded on first use (see warm_up_models)
 # -----------------------------
-try:
+def _load_vader():
     from nltk.sentiment.vader import SentimentIntensityAnalyzer
-    SIA = SentimentIntensityAnalyzer()
-    SIA_AVAILABLE = True
-except Exception as e:
-    print("⚠️ Sentiment not available:", e)
-    SIA_AVAILABLE = False
+    return SentimentIntensityAnalyzer()
+
+
+MODELS.register("vader", _load_vader)
+
+
+def get_sia():
+    """VADER analyzer, or None when NLTK / the lexicon isn't available."""
+    return MODELS.get("vader")
+
+
+MODELS.register("sentiment_scorer", lambda: SentimentScorer(get_sia()))
+
+
+def get_scorer():
+    return MODELS.get("sentiment_scorer")
+
+
+# -----------------------------
+# Emotion inference (process pool + micro-batching)
+# Tune with EMOTION_WORKERS / EMOTION_MAX_BATCH / EMOTION_MAX_WAIT_MS /
+# EMOTION_QUEUE_SIZE / EMOTION_TIMEOUT / EMOTION_DETECTOR
+# -----------------------------
+EMOTION_SERVICE = service_from_env()
+MODELS.register("emotion", EMOTION_SERVICE.warm_up)
+
+# Downscale + face-box reuse in front of the model.
+# Tune with EMOTION_TARGET_WIDTH / EMOTION_BOX_TTL / EMOTION_BOX_MAX_REUSE / EMOTION_BOX_MARGIN
+FRAME_PREP = preprocessor_from_env()
+
+# Continuous camera sessions (sampled, overload drops frames, windowed + smoothed results)
+EMOTION_SESSIONS = sessions_from_env(EMOTION_SERVICE, FRAME_PREP)
+
+# Models that live in this process and can be shared copy-on-write when
+# gunicorn preloads the app in the master. The emotion model lives in its own
+# process pool and is only warmed inside workers.
+IN_PROCESS_MODELS = ["vader", "sentiment_scorer", "risk_model"]
+
+
+def warm_up_models(names=None):
+    return MODELS.warm_up(names)
+
 
 # -----------------------------
 # Flask app
 # -----------------------------
 app = Flask(__name__, static_folder=STATIC_DIR, template_folder=STATIC_DIR)
 
+# -----------------------------
+# Instrumentation: per-route latency, DB calls per request, stage timings,
+# exposed at /metrics. PROFILE_REQUESTS=1 lets a request ask for a sampling
+# profile with an "X-Profile: 1" header (written to PROFILE_DIR).
+# -----------------------------
+METRICS = Metrics()
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS") == "1"
+
+
+@app.before_request
+def _begin_request_metrics():
+    METRICS.begin_request(request.url_rule.rule if request.url_rule else "<unmatched>")
+    g.profiler = None
+    if PROFILE_REQUESTS and request.headers.get("X-Profile") == "1":
+        g.profiler = SamplingProfiler().start()
+
+
+@app.after_request
+def _end_request_metrics(response):
+    stats = METRICS.end_request(request.method, response.status_code)
+    if stats is not None and stats.db_calls:
+        timing = f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_calls} queries"'
+        existing = response.headers.get("Server-Timing")
+        response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+    profiler = g.get("profiler")
+    if profiler is not None:
+        g.profiler = None
+        route = stats.route if stats else request.path
+        try:
+            response.headers["X-Profile-File"] = save_profile(profiler.stop(), route)
+            METRICS.profiles.inc(route)
+        except Exception as e:
+            print("⚠️ profile write error:", e)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
 # -----------------------------
 # MySQL Config (update as needed)
 # -----------------------------
@@ -108,125 +166,72 @@ def ensure_mysql_db():
     conn.close()
 
 
-def get_connection():
+def _open_connection():
     return mysql.connector.connect(**DB_CONFIG)
 
 
+# One pool per gunicorn worker (the pool re-initialises itself after fork).
+# Tune with DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW / DB_POOL_TIMEOUT / DB_POOL_RECYCLE.
+DB_POOL = pool_from_env(METRICS.count_connection(_open_connection))
+METRICS.collect("mindease_db_pool", DB_POOL.stats)
+
+
+def get_connection():
+    """
+    Borrow a connection from the pool. conn.close() returns it to the pool;
+    stale or broken connections are replaced transparently on checkout.
+    Statements run on it are counted and timed for /metrics.
+    """
+    return METRICS.instrument_connection(DB_POOL.get())
+
+
+# -----------------------------
+# Password hashing (bounded thread pool, upgradable parameters)
+# Tune with PASSWORD_HASH_METHOD (werkzeug method, e.g. scrypt:65536:8:1) /
+# PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE / PASSWORD_HASH_TIMEOUT
+# -----------------------------
+HASHER = hasher_from_env()
+
+
+def password_updater(table, row_id, old_hash, on_saved=None):
+    """save() for HASHER.rehash_later: swaps in the new hash unless the password changed meanwhile."""
+    def save(new_hash):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"UPDATE {table} SET password=%s WHERE id=%s AND password=%s", (new_hash, row_id, old_hash))
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        if on_saved:
+            on_saved()
+    return save
+
+
 # -----------------------------
 # Init Tables
+# Schema lives in backend/migrations/NNNN_*.sql; set DB_MIGRATE_ON_START=0
+# to run `flask db-migrate` as a separate deploy step instead.
 # -----------------------------
 def init_mysql_tables():
     ensure_mysql_db()
     conn = get_connection()
-    cursor = conn.cursor()
-
-    # users table with email included
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(255) UNIQUE,
-            email VARCHAR(255) UNIQUE,
-            password VARCHAR(255)
-        )
-    """)
-
-    # chat_logs table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chat_logs (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT,
-            message TEXT,
-            sentiment_score FLOAT,
-            sentiment_label VARCHAR(20),
-            suggestion TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    # questionnaire_responses table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS questionnaire_responses (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT,
-            stress_score FLOAT,
-            anxiety_score FLOAT,
-            depression_score FLOAT,
-            social_support FLOAT,
-            parental_relation FLOAT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    # -------------------------------
-    # NEW: Peer Support tables
-    # -------------------------------
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS peer_messages (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT,
-            text TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS peer_replies (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            message_id INT,
-            user_id INT,
-            text TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (message_id) REFERENCES peer_messages(id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS peer_reactions (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            message_id INT,
-            user_id INT,
-            emoji VARCHAR(10),
-            FOREIGN KEY (message_id) REFERENCES peer_messages(id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS peer_mood (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT,
-            mood VARCHAR(10),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        migrations.migrate(conn)
+    finally:
+        conn.close()
 
 
 def init_admin_table():
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admins (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) UNIQUE,
-                password VARCHAR(255)
-            )
-        """)
         # Ensure default admin exists
         cursor.execute("SELECT id FROM admins WHERE username=%s", ("admin",))
         row = cursor.fetchone()
         if not row:
-            hashed = generate_password_hash("admin123")
+            hashed = HASHER.hash("admin123")
             cursor.execute(
                 "INSERT INTO admins (username, password) VALUES (%s,%s)",
                 ("admin", hashed)
@@ -241,7 +246,14 @@ def init_admin_table():
 
 # -----------------------------
 # User Helpers
+# Lookups go through a TTL + LRU cache (unknown users cached briefly too).
+# Tune with USER_CACHE_TTL / USER_CACHE_NEGATIVE_TTL / USER_CACHE_SIZE /
+# USER_CACHE_LOCAL_NEGATIVE_TTL (unknown users, per worker, no shared store);
+# USER_CACHE_SHARED=<sqlite path> shares entries between workers on one host.
 # -----------------------------
+USER_CACHE = user_cache_from_env()
+
+
 def add_user(username, email, password):
     conn = get_connection()
     cursor = conn.cursor()
@@ -253,15 +265,17 @@ def add_user(username, email, password):
     user_id = cursor.lastrowid
     cursor.close()
     conn.close()
+    # drop the negative entries signup/login may have cached for this user
+    USER_CACHE.invalidate(username_key(username), email_key(email))
     return user_id
 
 
-def get_user_by_email(email):
+def _load_user(column, value):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute(
-        "SELECT id, username, email, password FROM users WHERE email=%s",
-        (email,)
+        f"SELECT id, username, email, password FROM users WHERE {column}=%s",
+        (value,)
     )
     row = cursor.fetchone()
     cursor.close()
@@ -271,65 +285,167 @@ def get_user_by_email(email):
     return None
 
 
+def get_user_by_email(email):
+    return USER_CACHE.get_or_load(email_key(email), lambda: _load_user("email", email))
+
+
 def get_user(username):
+    return USER_CACHE.get_or_load(username_key(username), lambda: _load_user("username", username))
+
+
+def invalidate_user(user):
+    USER_CACHE.invalidate(username_key(user["username"]), email_key(user["email"]))
+
+
+# -----------------------------
+# Write-behind inserts for chat_logs (and questionnaire_responses when a direct insert fails)
+# Rows carry their own created_at so a delayed flush keeps the real time.
+# Tune with WRITE_BEHIND (0 = write synchronously) / WRITE_BEHIND_FLUSH_MS /
+# WRITE_BEHIND_MAX_BATCH / WRITE_BEHIND_QUEUE_SIZE / WRITE_BEHIND_SPILL_DIR
+# -----------------------------
+QUESTIONNAIRE_INSERT_SQL = """INSERT INTO questionnaire_responses
+    (user_id, stress_score, anxiety_score, depression_score, social_support, parental_relation, created_at)
+    VALUES (%s,%s,%s,%s,%s,%s,%s)"""
+
+WRITE_BEHIND = WriteBehindBuffer(
+    get_connection,
+    tables={
+        "chat_logs": """INSERT INTO chat_logs
+            (user_id, message, sentiment_score, sentiment_label, suggestion, created_at)
+            VALUES (%s,%s,%s,%s,%s,%s)""",
+        # submits insert directly (save_questionnaire); this is only the fallback when that fails
+        "questionnaire_responses": QUESTIONNAIRE_INSERT_SQL,
+    },
+    spill_dir=os.getenv("WRITE_BEHIND_SPILL_DIR", os.path.join(BASE, "data", "spill")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_MS", "500")) / 1000.0,
+    max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500")),
+    queue_size=int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000")),
+    enabled=os.getenv("WRITE_BEHIND", "1") != "0",
+    # keep the admin rollups in step with every questionnaire insert
+    hooks={"questionnaire_responses": rollups.apply_questionnaire_rows},
+)
+METRICS.collect("mindease_write_behind", WRITE_BEHIND.stats)
+METRICS.collect("mindease_emotion", EMOTION_SERVICE.stats)
+
+
+# Newest questionnaire points per user, served to the dashboard charts from memory.
+# Tune with QUESTIONNAIRE_CACHE_USERS / QUESTIONNAIRE_CACHE_TTL
+RECENT_QUESTIONNAIRES = RecentHistory(
+    QUESTIONNAIRE_HISTORY,
+    per_user=QUESTIONNAIRE_HISTORY.default_limit,
+    max_users=int(os.getenv("QUESTIONNAIRE_CACHE_USERS", "1024")),
+    ttl=float(os.getenv("QUESTIONNAIRE_CACHE_TTL", "30")),
+)
+
+
+def save_questionnaire(row):
+    """Insert one response and fold it into the rollups in a single transaction; returns the new id."""
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, username, email, password FROM users WHERE username=%s",
-        (username,)
-    )
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if row:
-        return {"id": row[0], "username": row[1], "email": row[2], "password": row[3]}
-    return None
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(QUESTIONNAIRE_INSERT_SQL, row)
+            new_id = cursor.lastrowid
+            rollups.apply_questionnaire_rows(cursor, [row])
+            conn.commit()
+            return new_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
 
 
 # Init tables at startup
-init_mysql_tables()
+if os.getenv("DB_MIGRATE_ON_START", "1") != "0":
+    init_mysql_tables()
 init_admin_table()
+peer_events.ensure_log()
+
+# Community mood over the last 5m / 1h / 24h (sliding windows, kept in sync
+# between workers through the peer event log). Seeded here so preloaded
+# workers inherit it; otherwise the first summary request seeds.
+PEER_MOOD = MoodWindows()
+
+
+def seed_peer_mood():
+    try:
+        conn = get_connection()
+        try:
+            PEER_MOOD.seed(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        print("⚠️ peer mood seed error:", e)
+
+
+seed_peer_mood()
+
+if os.getenv("PRELOAD_MODELS") == "1":
+    warm_up_models(IN_PROCESS_MODELS)
+
+STARTUP_SECONDS = time.perf_counter() - _IMPORT_STARTED
+print(f"✅ app imported in {STARTUP_SECONDS * 1000:.0f} ms (pid {os.getpid()})")
 
 # -----------------------------
 # Suggestion logic (chat)
 # -----------------------------
+# Keyword + score-range rules live in data/suggestion_rules.json and are
+# reloaded automatically when the file changes.
+RULES = RuleSet(os.path.join(BASE, "data", "suggestion_rules.json"))
+
+
 def get_suggestion(score, text=""):
-    text = (text or "").lower()
-
-    # Keyword-based detection first
-    if any(word in text for word in ["tired", "exhausted", "fatigued", "sleepy", "drowsy"]):
-        return "It sounds like you're feeling tired. Try taking a short rest, staying hydrated, or adjusting your sleep routine."
-    if any(word in text for word in ["anxious", "worried", "nervous", "tense"]):
-        return "I sense some anxiety. Deep breathing or journaling your thoughts may help calm your mind."
-    if any(word in text for word in ["angry", "frustrated", "mad", "furious"]):
-        return "It seems like you're upset. Taking a break or practicing relaxation techniques might help."
-    if any(word in text for word in ["sad", "lonely", "depressed", "down"]):
-        return "I hear some sadness in your words. Talking to a close friend or engaging in a hobby may lift your mood."
-
-    # Fallback to sentiment-score ranges
-    if score <= -0.5:
-        return "Your input indicates high stress. Try deep breathing for a few minutes and consider sharing your thoughts with someone you trust."
-    elif -0.5 < score <= -0.2:
-        return "Your input shows moderate stress. A short walk or writing down your feelings may help calm your mind."
-    elif -0.2 < score <= 0.2:
-        return "Your input suggests low stress. You could try a quick relaxation exercise, like stretching or listening to music."
-    else:
-        return "Your input reflects no stress. Keep maintaining your positive habits and continue doing what makes you feel good."
+    return RULES.current().chat_suggestion(score, text)
 
 
 # -----------------------------
 # Routes
 # -----------------------------
+# Static files come from an in-memory table (no filesystem probe per request).
+# `flask build-static` writes fingerprinted, pre-compressed copies to build/static;
+# without a build, static/ is served as-is and rescanned every STATIC_RESCAN_SECONDS.
+STATIC_ASSETS = StaticAssets(
+    STATIC_DIR,
+    build_dir=os.getenv("STATIC_BUILD_DIR", os.path.join(BASE, "build", "static")),
+    rescan_interval=float(os.getenv("STATIC_RESCAN_SECONDS", "5")),
+)
+
+
 @app.route("/")
 def index():
-    return send_from_directory(STATIC_DIR, "login.html")
+    return STATIC_ASSETS.serve("login.html", request.headers.get("Accept-Encoding"))
 
 
 @app.route("/<path:filename>")
 def static_pages(filename):
-    if os.path.exists(os.path.join(STATIC_DIR, filename)):
-        return send_from_directory(STATIC_DIR, filename)
-    return send_from_directory(STATIC_DIR, "login.html")
+    accept = request.headers.get("Accept-Encoding")
+    return STATIC_ASSETS.serve(filename, accept) or STATIC_ASSETS.serve("login.html", accept)
+
+
+@app.cli.command("build-static")
+def build_static_command():
+    """Fingerprint and pre-compress static/ into the static build directory."""
+    manifest = build_static(STATIC_DIR, STATIC_ASSETS.build_dir)
+    hashed = sum(1 for k, v in manifest.items() if k != v)
+    print(f"✅ built {len(manifest)} static files ({hashed} fingerprinted) into {STATIC_ASSETS.build_dir}")
+
+
+@app.route('/api/admin/static', methods=['GET'])
+def admin_static():
+    return jsonify(STATIC_ASSETS.stats())
+
+
+@app.route('/api/admin/auth', methods=['GET'])
+def admin_auth_stats():
+    return jsonify(HASHER.stats())
+
+
+@app.route('/api/admin/user_cache', methods=['GET'])
+def admin_user_cache():
+    return jsonify(USER_CACHE.stats())
 
 
 # --- Signup ---
@@ -349,7 +465,12 @@ def signup():
         return jsonify({"message": "user exists"}), 400
 
     # Save new user
-    hashed_pw = generate_password_hash(password)
+    try:
+        hashed_pw = HASHER.hash(password)
+    except HasherBusy as e:
+        return jsonify({"message": str(e)}), 429, {"Retry-After": "1"}
+    except HasherTimeout as e:
+        return jsonify({"message": str(e)}), 503, {"Retry-After": "1"}
     user_id = add_user(username, email, hashed_pw)
 
     return jsonify({
@@ -370,8 +491,17 @@ def login():
         return jsonify({"message": "missing fields"}), 400
 
     user = get_user_by_email(email)
-    if not user or not check_password_hash(user["password"], password):
+    try:
+        valid = bool(user) and HASHER.verify(user["password"], password)
+    except HasherBusy as e:
+        return jsonify({"message": str(e)}), 429, {"Retry-After": "1"}
+    except HasherTimeout as e:
+        return jsonify({"message": str(e)}), 503, {"Retry-After": "1"}
+    if not valid:
         return jsonify({"message": "invalid credentials"}), 401
+    if HASHER.needs_rehash(user["password"]):
+        HASHER.rehash_later(password, password_updater("users", user["id"], user["password"],
+                                                       on_saved=lambda: invalidate_user(user)))
 
     return jsonify({
         "ok": True,
@@ -419,10 +549,16 @@ def admin_login():
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
 
         admin_id, hashed = row[0], row[1]
-        if check_password_hash(hashed, password):
+        if HASHER.verify(hashed, password):
+            if HASHER.needs_rehash(hashed):
+                HASHER.rehash_later(password, password_updater("admins", admin_id, hashed))
             return jsonify({'success': True, 'admin_id': admin_id}), 200
         else:
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+    except HasherBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 429, {"Retry-After": "1"}
+    except HasherTimeout as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         print("⚠️ admin login error:", e)
         return jsonify({'success': False, 'message': 'Server error'}), 500
@@ -443,14 +579,20 @@ def admin_create():
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM admins WHERE username=%s", (username,))
         if cursor.fetchone():
+            cursor.close()
+            conn.close()
             return jsonify({'success': False, 'message': 'Admin already exists'}), 400
 
-        hashed = generate_password_hash(password)
+        hashed = HASHER.hash(password)
         cursor.execute("INSERT INTO admins (username, password) VALUES (%s,%s)", (username, hashed))
         conn.commit()
         cursor.close()
         conn.close()
         return jsonify({'success': True, 'message': 'Admin created successfully'}), 200
+    except HasherBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 429, {"Retry-After": "1"}
+    except HasherTimeout as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         print("⚠️ admin_create error:", e)
         return jsonify({'success': False, 'message': 'Server error'}), 500
@@ -459,43 +601,165 @@ def admin_create():
 # --- Admin Metrics ---
 @app.route('/api/admin/metrics', methods=['GET'])
 def admin_metrics():
+    """
+    Averages come from the questionnaire rollups (constant time). Optional
+    ?bucket=hour|day|week with ?start=/?end= (ISO dates, default last 30 days)
+    and ?user_id= adds a 'series' for the dashboard charts.
+    """
+    bucket = request.args.get('bucket')
+    if bucket and bucket not in rollups.BUCKETS:
+        return jsonify({'error': 'bucket must be hour, day or week'}), 400
+    try:
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.now()
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'start/end must be ISO dates'}), 400
+
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""SELECT AVG(stress_score) AS avg_stress,
-                                 AVG(anxiety_score) AS avg_anxiety,
-                                 AVG(depression_score) AS avg_depression,
-                                 COUNT(*) AS total_entries
-                          FROM questionnaire_responses""")
-        agg = cursor.fetchone()
-
         cursor.execute("""SELECT created_at, stress_score, anxiety_score, depression_score
                           FROM questionnaire_responses
                           ORDER BY created_at DESC LIMIT 30""")
         rows = cursor.fetchall()
         cursor.close()
+
+        cursor = conn.cursor()
+        result = rollups.totals(cursor)
+        if bucket:
+            result['series'] = rollups.series(cursor, start, end, bucket, request.args.get('user_id', type=int))
+        cursor.close()
         conn.close()
 
-        history = [{
+        result['history'] = [{
             'timestamp': r['created_at'].isoformat() if hasattr(r['created_at'],'isoformat') else str(r['created_at']),
             'stress': r['stress_score'],
             'anxiety': r['anxiety_score'],
             'depression': r['depression_score']
         } for r in rows]
-
-        return jsonify({
-            'avg_stress': float(agg['avg_stress']) if agg and agg['avg_stress'] else 0.0,
-            'avg_anxiety': float(agg['avg_anxiety']) if agg and agg['avg_anxiety'] else 0.0,
-            'avg_depression': float(agg['avg_depression']) if agg and agg['avg_depression'] else 0.0,
-            'total_entries': int(agg['total_entries']) if agg and agg['total_entries'] else 0,
-            'history': history
-        })
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print('⚠️ admin_metrics error:', e)
         return jsonify({'error': str(e)}), 500
 
 
+@app.cli.command("rollups-backfill")
+def rollups_backfill_command():
+    """Rebuild the questionnaire rollups from questionnaire_responses."""
+    conn = get_connection()
+    try:
+        total = rollups.backfill(conn)
+    finally:
+        conn.close()
+    print(f"✅ rollups rebuilt from {total} questionnaire responses")
+
+
+# --- Schema migrations ---
+@app.cli.command("db-migrate")
+def db_migrate_command():
+    """Apply pending migrations from backend/migrations."""
+    init_mysql_tables()
+
+
+@app.cli.command("db-check")
+def db_check_command():
+    """EXPLAIN the hot queries; exits non-zero if one of them scans a table."""
+    conn = get_connection()
+    try:
+        report = migrations.explain(conn)
+    finally:
+        conn.close()
+    for name, result in report.items():
+        keys = ", ".join(f"{p['table']}:{p['key'] or p['type']}" for p in result['plan'])
+        flag = "✅" if result['ok'] else "⚠️"
+        print(f"{flag} {name}: {keys}{' (filesort)' if result['filesort'] else ''}")
+    if not all(r['ok'] for r in report.values()):
+        sys.exit(1)
+
+
+@app.route('/api/admin/schema', methods=['GET'])
+def admin_schema():
+    try:
+        conn = get_connection()
+        try:
+            result = {'migrations': migrations.status(conn)}
+            if request.args.get('explain') == '1':
+                result['explain'] = migrations.explain(conn)
+        finally:
+            conn.close()
+        return jsonify(result)
+    except Exception as e:
+        print('⚠️ admin_schema error:', e)
+        return jsonify({'error': str(e)}), 500
+
+
+# --- Startup / model warm-up ---
+@app.route('/api/admin/startup', methods=['GET'])
+def admin_startup():
+    return jsonify({
+        'import_seconds': round(STARTUP_SECONDS, 4),
+        'pid': os.getpid(),
+        'models': MODELS.report()
+    })
+
+
+@app.route('/api/admin/warmup', methods=['POST'])
+def admin_warmup():
+    names = (request.json or {}).get('models') if request.is_json else None
+    return jsonify({'models': warm_up_models(names)})
+
+
+# --- Risk model versions (hot swap) ---
+@app.route('/api/admin/models', methods=['GET'])
+def admin_models():
+    if request.args.get('refresh') == '1':
+        inference.MODEL_STORE.refresh()
+    return jsonify(inference.MODEL_STORE.stats())
+
+
+@app.cli.command("model-publish")
+@click.argument("path")
+@click.option("--name", default=None, help="Version name (default: timestamp).")
+def model_publish_command(path, name):
+    """Install a joblib artifact as the next risk model version; workers swap it in on their next check."""
+    print(f"✅ published {inference.MODEL_STORE.publish(path, name)}")
+
+
+# --- Write-behind stats ---
+@app.route('/api/admin/write_behind', methods=['GET'])
+def admin_write_behind():
+    return jsonify(WRITE_BEHIND.stats())
+
+
+@app.route('/api/admin/history_cache', methods=['GET'])
+def admin_history_cache():
+    return jsonify(RECENT_QUESTIONNAIRES.stats())
+
+
+# --- DB pool stats ---
+@app.route('/api/admin/db_pool', methods=['GET'])
+def admin_db_pool():
+    return jsonify(DB_POOL.stats())
+
+
 # --- Chatbot (sentiment + suggestions) ---
+CHAT_INSERT_SQL = "INSERT INTO chat_logs (user_id, message, sentiment_score, sentiment_label, suggestion) VALUES (%s,%s,%s,%s,%s)"
+CHAT_BATCH_MAX = int(os.getenv("CHAT_BATCH_MAX", "1000"))
+
+
+def chat_result(text, score, label):
+    with METRICS.stage("suggestion"):
+        suggestion = get_suggestion(score, text)
+    return {
+        "reply": f"I hear you. (sentiment: {label}) — You said: {text}",
+        "label": label,
+        "score": score,
+        "suggestion": suggestion
+    }
+
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
     payload = request.json or {}
@@ -505,79 +769,196 @@ def chat():
     if not text:
         return jsonify({"reply": "Please send a message."})
 
-    # sentiment
-    score, label = 0.0, "NEUTRAL"
-    if SIA_AVAILABLE:
-        s = SIA.polarity_scores(text)
-        score = s.get("compound", 0.0)
-        if score >= 0.05:
-            label = "POSITIVE"
-        elif score <= -0.05:
-            label = "NEGATIVE"
-        else:
-            label = "NEUTRAL"
-
-    # Generate suggestion
-    suggestion = get_suggestion(score, text)
+    # sentiment + suggestion
+    with METRICS.stage("vader"):
+        score, label = get_scorer().score(text)
+    result = chat_result(text, score, label)
 
-    reply = f"I hear you. (sentiment: {label}) — You said: {text}"
-
-    # Save chat in DB
+    # Save chat in DB (queued; flushed in batches by the write-behind writer)
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO chat_logs (user_id, message, sentiment_score, sentiment_label, suggestion) VALUES (%s,%s,%s,%s,%s)",
-            (user_id, text, score, label, suggestion)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        WRITE_BEHIND.enqueue("chat_logs", (user_id, text, score, label, result["suggestion"], datetime.now()))
     except Exception as e:
         print("⚠️ DB insert error:", e)
 
-    return jsonify({
-        "reply": reply,
-        "label": label,
-        "score": score,
-        "suggestion": suggestion
-    })
+    return jsonify(result)
+
+
+@app.route("/api/chat/batch", methods=["POST"])
+def chat_batch():
+    """
+    Score many messages at once (chatbot history imports, offline backfills).
+    Body: {"messages": [{"text": ..., "user_id": ...}, ...], "persist": true}
+    or {"texts": [...], "user_id": ...}. Each result matches what /api/chat
+    would return for that message; rows are saved with one multi-row INSERT.
+    """
+    payload = request.json or {}
+    if not isinstance(payload, dict):
+        return jsonify({"message": "body must be a JSON object"}), 400
+    if "messages" in payload:
+        messages = payload.get("messages") or []
+        if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+            return jsonify({"message": "messages must be a list of objects"}), 400
+        items = [(m.get("text"), m.get("user_id", payload.get("user_id"))) for m in messages]
+    else:
+        texts = payload.get("texts") or []
+        if not isinstance(texts, list):
+            return jsonify({"message": "texts must be a list"}), 400
+        items = [(t, payload.get("user_id")) for t in texts]
+    if not all(text is None or isinstance(text, str) for text, _ in items):
+        return jsonify({"message": "each text must be a string"}), 400
+    items = [((text or "").strip(), user_id) for text, user_id in items]
+
+    if len(items) > CHAT_BATCH_MAX:
+        return jsonify({"message": f"at most {CHAT_BATCH_MAX} messages per batch"}), 413
+
+    texts = [text for text, _ in items if text]
+    with METRICS.stage("vader"):
+        scores = dict(zip(texts, get_scorer().score_many(texts)))
+
+    results, rows = [], []
+    for text, user_id in items:
+        if not text:
+            results.append({"reply": "Please send a message."})
+            continue
+        score, label = scores[text]
+        result = chat_result(text, score, label)
+        results.append(result)
+        rows.append((user_id, text, score, label, result["suggestion"]))
+
+    inserted = 0
+    if rows and payload.get("persist", True):
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            # mysql-connector rewrites executemany INSERTs into a single multi-row statement
+            cursor.executemany(CHAT_INSERT_SQL, rows)
+            conn.commit()
+            inserted = len(rows)
+            cursor.close()
+            conn.close()
+        except Exception as e:
+            print("⚠️ DB batch insert error:", e)
+
+    return jsonify({"results": results, "inserted": inserted})
 
 
 # --- History ---
+def history_response(query, user_id, cache=None):
+    """
+    Shared by /api/history and /api/questionnaire/history:
+    ?limit= ?before=<id> ?since=<id> ?fields=a,b plus ETag / If-None-Match.
+    The body stays a plain list; cursors go in X-Next-Before / X-Next-Since / X-Latest-Id.
+    With a RecentHistory cache, per-user reads are answered from memory when it can.
+    """
+    try:
+        fields = query.parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = request.args.get("limit", type=int)
+    before = request.args.get("before", type=int)
+    since = request.args.get("since", type=int)
+    if user_id is None:
+        cache = None
+
+    conn = None
+    try:
+        latest = cache.latest_id(user_id, since) if cache else None
+        if latest is None:
+            conn = get_connection()
+            cursor = conn.cursor(dictionary=True)
+            if cache:
+                cache.load(cursor, user_id)
+                latest = cache.latest_id(user_id)
+            else:
+                latest = query.latest_id(cursor, user_id)
+            cursor.close()
+
+        etag = make_etag(latest, user_id, fields, limit, before, since)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            resp = Response(status=304)
+        else:
+            page = cache.page(user_id, limit, before, since) if cache else None
+            if page is None:
+                conn = conn or get_connection()
+                cursor = conn.cursor(dictionary=True)
+                page = query.fetch(cursor, fields, user_id, limit, before, since)
+                cursor.close()
+            rows, more = page
+            resp = jsonify(query.serialize(rows, fields))
+            if rows and more:
+                # page full: there may be more older (before) or newer (since) rows
+                if since is None:
+                    resp.headers["X-Next-Before"] = str(rows[-1]["id"])
+                else:
+                    resp.headers["X-Next-Since"] = str(rows[0]["id"])
+    finally:
+        if conn is not None:
+            conn.close()
+    resp.headers["ETag"] = etag
+    resp.headers["X-Latest-Id"] = str(latest)
+    # let browsers keep the copy but revalidate it every time (cheap 304s)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
 @app.route("/api/history", methods=["GET"])
 def history():
-    logs = []
+    user_id = request.args.get("user_id", type=int)
+    if user_id is None:
+        return jsonify({"error": "user_id is required"}), 400
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, user_id, message AS text, sentiment_score AS score,
-                   sentiment_label AS label, suggestion, created_at
-            FROM chat_logs ORDER BY created_at DESC LIMIT 200
-        """)
-        logs = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        return history_response(CHAT_HISTORY, user_id)
     except Exception as e:
         print("⚠️ History DB error:", e)
-    return jsonify(logs)
+        return jsonify([])
+
+
+@app.route("/api/admin/history", methods=["GET"])
+def admin_history():
+    # every user's chat log unless ?user_id= narrows it
+    try:
+        return history_response(CHAT_HISTORY, request.args.get("user_id", type=int))
+    except Exception as e:
+        print("⚠️ History DB error:", e)
+        return jsonify([])
 
 
 # --- Emotion Detection ---
 @app.route("/api/emotion", methods=["POST"])
 def detect_emotion():
+    # accepts multipart, raw image/* or application/octet-stream bodies, or the original JSON data URL
+    timer = StageTimer()
     try:
-        data = request.json["image"]
-        image_data = re.sub("^data:image/.+;base64,", "", data)
-        img_bytes = base64.b64decode(image_data)
-        img_array = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-
-        analysis = DeepFace.analyze(frame, actions=["emotion"], enforce_detection=False)
-        dominant_emotion = analysis[0]["dominant_emotion"]
-
-        return jsonify({"emotion": dominant_emotion})
+        with timer.stage("decode"):
+            frame = frame_from_request(request)
+
+        # consecutive frames from the same client reuse its last face box and skip detection;
+        # only with an explicit X-Client-Id: behind a proxy/NAT remote_addr is shared by everyone
+        client_key = request.headers.get("X-Client-Id")
+        face_input, shape, detect = FRAME_PREP.prepare(frame, client_key, timer)
+
+        with timer.stage("inference"):
+            analysis = EMOTION_SERVICE.analyze(face_input, detect)
+        for stage, seconds in (analysis.get("timings") or {}).items():
+            timer.add("model_" + stage, seconds)
+        FRAME_PREP.remember(client_key, shape, analysis.get("region"))
+        FRAME_PREP.record(timer)
+        for stage, seconds in timer.stages.items():
+            # model_detect / model_model are DeepFace's own timings inside the worker
+            METRICS.record_stage("deepface_" + stage[6:] if stage.startswith("model_") else "emotion_" + stage, seconds)
+        dominant_emotion = analysis["dominant_emotion"]
+
+        resp = jsonify({"emotion": dominant_emotion})
+        resp.headers["Server-Timing"] = timer.server_timing()
+        return resp
+    except FrameTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except (FrameError, binascii.Error) as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "1"}
+    except FutureTimeout:
+        return jsonify({"error": "emotion analysis timed out"}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -587,6 +968,67 @@ def face_recognition_alias():
     return detect_emotion()
 
 
+@app.route("/api/emotion/stats", methods=["GET"])
+def emotion_stats():
+    data = EMOTION_SERVICE.stats()
+    data["preprocess"] = FRAME_PREP.stats()
+    data["sessions"] = EMOTION_SESSIONS.stats()
+    return jsonify(data)
+
+
+# --- Emotion video sessions ---
+@app.route("/api/emotion/session", methods=["POST"])
+def emotion_session_start():
+    data = request.get_json(silent=True) or {}
+    try:
+        session = EMOTION_SESSIONS.create(
+            sample_interval=data.get("sample_interval"),
+            window_seconds=data.get("window_seconds"),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    return jsonify({
+        "session_id": session.id,
+        "sample_interval": session.sample_interval,
+        "window_seconds": session.window_seconds
+    })
+
+
+@app.route("/api/emotion/session/<session_id>/frames", methods=["POST"])
+def emotion_session_frames(session_id):
+    # body: length-prefixed frames (see emotion_sessions.FRAME_HEADER), read as it arrives;
+    # a single image/* body is also accepted and stamped with the server time
+    try:
+        session = EMOTION_SESSIONS.get(session_id)
+        futures = []
+        if (request.mimetype or "").startswith("image/"):
+            futures.append(session.offer(time.time(), request.get_data(cache=False)))
+        else:
+            for ts, image_bytes in iter_framed(request.stream):
+                futures.append(session.offer(ts, image_bytes))
+        futures = [f for f in futures if f is not None]
+        if futures and request.args.get("wait", "1") != "0":
+            futures_wait(futures, timeout=EMOTION_SERVICE.timeout)
+        return jsonify(session.snapshot(since=request.args.get("since", default=0, type=int)))
+    except SessionNotFound:
+        return jsonify({"error": "unknown or expired session"}), 404
+    except FrameError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/emotion/session/<session_id>", methods=["GET", "DELETE"])
+def emotion_session(session_id):
+    try:
+        if request.method == "DELETE":
+            return jsonify(EMOTION_SESSIONS.end(session_id))
+        session = EMOTION_SESSIONS.get(session_id)
+        return jsonify(session.snapshot(since=request.args.get("since", default=0, type=int)))
+    except SessionNotFound:
+        return jsonify({"error": "unknown or expired session"}), 404
+
+
 # -----------------------------
 # Questionnaire helpers + endpoints
 # -----------------------------
@@ -599,34 +1041,22 @@ def _scale_avg_to_100(avg):
 
 
 def get_questionnaire_suggestions(stress_score, anxiety_score, depression_score, social_support, parental_relation):
-    tips = []
-    if depression_score >= 75:
-        tips.append("Your responses indicate a high level of depressive symptoms. Please consider reaching out to a mental health professional or school counselor.")
-    if anxiety_score >= 75:
-        tips.append("High anxiety detected — try grounding techniques: 4-4-4 breathing (inhale 4s, hold 4s, exhale 4s) and practice short relaxation breaks.")
-    if stress_score >= 75:
-        tips.append("High stress detected — schedule short breaks, break tasks into small steps, and ensure regular sleep.")
-    if social_support < 40:
-        tips.append("You may benefit from increasing social connections: join a club, study group, or extracurricular activity.")
-    if parental_relation < 40:
-        tips.append("Consider opening a small conversation with your parents/guardians about how you feel; start with one positive thing per day.")
-    if 50 <= stress_score < 75:
-        tips.append("Moderate stress — try time-blocking your study schedule and brief mindfulness exercises.")
-    if 50 <= anxiety_score < 75:
-        tips.append("Moderate anxiety — prepare for upcoming exams with a study plan and relaxation before bed.")
-    if 50 <= depression_score < 75:
-        tips.append("Moderate depressive signs — increase daily activities you enjoy and consider talking to a friend or mentor.")
-    if stress_score < 25 and anxiety_score < 25 and depression_score < 25:
-        tips.append("Your scores are in the low range — keep up healthy routines: sleep, hydration, and social time.")
-    if not tips:
-        tips.append("Keep monitoring your mental health. Small daily routines can help: sleep, move, and talk to someone you trust.")
-    return tips
+    return RULES.current().questionnaire_tips({
+        "stress_score": stress_score,
+        "anxiety_score": anxiety_score,
+        "depression_score": depression_score,
+        "social_support": social_support,
+        "parental_relation": parental_relation
+    })
 
 
 @app.route("/api/questionnaire", methods=["POST"])
 def questionnaire():
     data = request.json or {}
-    user_id = data.get("user_id") or 1
+    try:
+        user_id = int(data.get("user_id") or 1)
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "user_id must be an integer"}), 400
     stress_answers = data.get("stress", [])
     anxiety_answers = data.get("anxiety", [])
     depression_answers = data.get("depression", [])
@@ -658,33 +1088,21 @@ def questionnaire():
     social_support = _scale_avg_to_100(social_avg)
     parental_relation_score = _scale_avg_to_100(parental_avg)
 
+    # one transaction: the row plus its rollup increments; the response carries
+    # only the new point and its id, which is the client's ?since= cursor
+    submitted_at = datetime.now().replace(microsecond=0)
+    row = (user_id, stress_score, anxiety_score, depression_score, social_support, parental_relation_score, submitted_at)
+    version = None
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""INSERT INTO questionnaire_responses
-            (user_id, stress_score, anxiety_score, depression_score, social_support, parental_relation)
-            VALUES (%s,%s,%s,%s,%s,%s)
-        """, (user_id, stress_score, anxiety_score, depression_score, social_support, parental_relation_score))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        version = save_questionnaire(row)
     except Exception as e:
-        print("Questionnaire DB insert error:", e)
+        print("⚠️ Questionnaire DB insert error, queued for retry:", e)
+        WRITE_BEHIND.enqueue("questionnaire_responses", row)
 
-    history = []
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""SELECT created_at, stress_score, anxiety_score, depression_score
-                          FROM questionnaire_responses
-                          WHERE user_id=%s ORDER BY created_at DESC LIMIT 90""", (user_id,))
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        history = [{"timestamp": r["created_at"].isoformat() if hasattr(r["created_at"], "isoformat") else str(r["created_at"]),
-                    "stress": r["stress_score"], "anxiety": r["anxiety_score"], "depression": r["depression_score"]} for r in rows]
-    except Exception as e:
-        print("Questionnaire history read error:", e)
+    point = {"id": version, "timestamp": submitted_at, "stress": stress_score, "anxiety": anxiety_score,
+             "depression": depression_score, "social": social_support, "parental": parental_relation_score}
+    if version is not None:
+        RECENT_QUESTIONNAIRES.add(user_id, point)
 
     return jsonify({
         "ok": True,
@@ -693,7 +1111,8 @@ def questionnaire():
         "depression_score": depression_score,
         "social_support": social_support,
         "parental_relation": parental_relation_score,
-        "history": history,
+        "point": QUESTIONNAIRE_HISTORY.serialize([point], ["id"] + QUESTIONNAIRE_HISTORY.default_fields)[0],
+        "version": version,
         "suggestions": get_questionnaire_suggestions(stress_score, anxiety_score, depression_score, social_support, parental_relation_score)
     })
 
@@ -701,81 +1120,114 @@ def questionnaire():
 @app.route("/api/questionnaire/history", methods=["GET"])
 def questionnaire_history():
     user_id = request.args.get("user_id", type=int) or 1
-    items = []
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""SELECT created_at, stress_score, anxiety_score, depression_score
-                          FROM questionnaire_responses
-                          WHERE user_id=%s ORDER BY created_at DESC LIMIT 365""", (user_id,))
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        items = [{"timestamp": r["created_at"].isoformat() if hasattr(r["created_at"], "isoformat") else str(r["created_at"]),
-                  "stress": r["stress_score"], "anxiety": r["anxiety_score"], "depression": r["depression_score"]} for r in rows]
+        return history_response(QUESTIONNAIRE_HISTORY, user_id, RECENT_QUESTIONNAIRES)
     except Exception as e:
         print("Questionnaire history fetch error:", e)
-    return jsonify(items)
+        return jsonify([])
 
 # -----------------------------
-# Load Emergency Contacts from CSV
+# Emergency Contacts (CSV loaded once, reloaded when the file changes)
 # -----------------------------
+CONTACTS = ContactsCatalog(os.path.join(BASE, "data", "50_psychiatry_online_links_india.csv"))
+
+
 @app.route("/api/emergency/contacts", methods=["GET"])
 def emergency_contacts():
-    contacts = []
+    # optional ?location=Delhi (location words) &q=apol (name prefixes) &limit=N
+    location = request.args.get("location")
+    q = request.args.get("q")
+    limit = request.args.get("limit", type=int)
     try:
-        with open(os.path.join(BASE, "data", "50_psychiatry_online_links_india.csv"), encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                name = (row.get("name") or "").strip()
-                phone = (row.get("phone") or "").strip()
-                location = (row.get("location") or "").strip()
-                link = (row.get("link") or "").strip()
-
-                # Skip empty or "Unknown" entries
-                if not name or name.lower() == "unknown":
-                    continue  
-
-                contacts.append({
-                    "name": name,
-                    "phone": phone if phone else "N/A",
-                    "location": location if location else "N/A",
-                    "link": link if link else "#"
-                })
+        catalog = CONTACTS.current()
+        if location or q or limit:
+            etag = make_etag(len(catalog.rows), catalog.etag, location, q, limit)
+        else:
+            etag = catalog.etag
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            resp = Response(status=304)
+        elif location or q or limit:
+            resp = Response(catalog.filtered_json(location, q, limit), mimetype="application/json")
+        else:
+            resp = Response(catalog.body, mimetype="application/json")
+        resp.headers["ETag"] = etag
+        resp.headers["Cache-Control"] = "public, max-age=60"
+        return resp
     except Exception as e:
         print("⚠️ emergency_contacts error:", e)
-    return jsonify(contacts)
+        return jsonify([])
+
+
+@app.route("/api/admin/contacts", methods=["GET"])
+def admin_contacts():
+    return jsonify(CONTACTS.stats())
+
+
 # --- Peer Support APIs ---
 @app.route("/api/peer/messages", methods=["GET"])
 def get_peer_messages():
+    # ?before=<id> loads older pages, ?after=<id> only what is newer than the client has
+    limit = request.args.get("limit", type=int) or peer_feed.DEFAULT_LIMIT
+    before = request.args.get("before", type=int)
+    after = request.args.get("after", type=int)
+
+    # taken before the read so a client resuming from it can't miss an event (all deltas are idempotent)
+    version = peer_events.current_version()
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("SELECT * FROM peer_messages ORDER BY created_at DESC LIMIT 50")
-    msgs = cursor.fetchall()
-
-    result = []
-    for m in msgs:
-        cursor.execute("SELECT text, user_id FROM peer_replies WHERE message_id=%s", (m["id"],))
-        replies = cursor.fetchall()
-
-        cursor.execute("SELECT emoji, COUNT(*) as count FROM peer_reactions WHERE message_id=%s GROUP BY emoji", (m["id"],))
-        reactions = {r["emoji"]: r["count"] for r in cursor.fetchall()}
-
-        # pseudo anonymous user
-        pseudo = f"Peer#{m['user_id']}"
-        result.append({
-            "id": m["id"],
-            "user": pseudo,
-            "text": m["text"],
-            "replies": [{"text": r["text"], "user": f"Peer#{r['user_id']}"} for r in replies],
-            "reactions": reactions,
-            "badge": "🌟 Supportive" if len(replies) > 3 else None
-        })
+    try:
+        result = peer_feed.build_feed(conn, limit=limit, before=before, after=after)
+    finally:
+        conn.close()
+    resp = jsonify(result)
+    resp.headers["X-Peer-Version"] = version
+    return resp
+
+
+# --- Peer Support live updates ---
+# Streams and long-polls hold a gthread thread each; at most PEER_STREAM_MAX
+# per worker (default a quarter of GUNICORN_THREADS), the rest short-poll.
+PEER_STREAMS = peer_events.StreamSlots(
+    int(os.getenv("PEER_STREAM_MAX", str(max(1, int(os.getenv("GUNICORN_THREADS", "8")) // 4)))))
+PEER_POLL_AFTER = 5  # seconds between short polls for clients over the cap
+
+
+@app.route("/api/peer/stream", methods=["GET"])
+def peer_stream():
+    # Server-Sent Events; EventSource resends the last id as Last-Event-ID on reconnect
+    if not PEER_STREAMS.acquire():
+        # EventSource gives up on a non-200; the page then falls back to /api/peer/updates
+        return jsonify({"error": "too many live streams, poll /api/peer/updates"}), 503, {"Retry-After": str(PEER_POLL_AFTER)}
+    version = request.headers.get("Last-Event-ID") or request.args.get("since") or peer_events.current_version()
+    resp = Response(stream_with_context(peer_events.sse_stream(version)), mimetype="text/event-stream")
+    # runs when the server closes the response: stream finished or client gone
+    resp.call_on_close(PEER_STREAMS.release)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+@app.route("/api/peer/updates", methods=["GET"])
+def peer_updates():
+    # long-poll fallback for clients without EventSource; a plain poll when the worker is out of stream slots
+    version = request.args.get("since") or peer_events.current_version()
+    timeout = min(request.args.get("timeout", default=25.0, type=float), 25.0)
+    poll_after = 0
+    if timeout > 0 and PEER_STREAMS.acquire():
+        try:
+            new_version, events = peer_events.wait_for_events(version, timeout)
+        finally:
+            PEER_STREAMS.release()
+    else:
+        new_version, events = peer_events.read_since(version)
+        poll_after = PEER_POLL_AFTER
+    if new_version is None:
+        return jsonify({"reset": True, "version": peer_events.current_version(), "events": [], "poll_after": poll_after})
+    return jsonify({"reset": False, "version": new_version, "events": events, "poll_after": poll_after})
 
-    cursor.close()
-    conn.close()
-    return jsonify(result)
+
+@app.route("/api/admin/peer_streams", methods=["GET"])
+def admin_peer_streams():
+    return jsonify(PEER_STREAMS.stats())
 
 
 @app.route("/api/peer/message", methods=["POST"])
@@ -787,9 +1239,12 @@ def post_peer_message():
     cursor = conn.cursor()
     cursor.execute("INSERT INTO peer_messages (user_id, text) VALUES (%s,%s)", (user_id, text))
     conn.commit()
+    message_id = cursor.lastrowid
     cursor.close()
     conn.close()
-    return jsonify({"ok": True})
+    peer_events.publish("message", message=peer_feed.serialize_message(
+        {"id": message_id, "user_id": user_id, "text": text}, [], {}))
+    return jsonify({"ok": True, "id": message_id})
 
 
 @app.route("/api/peer/reply", methods=["POST"])
@@ -801,9 +1256,12 @@ def post_peer_reply():
     cursor = conn.cursor()
     cursor.execute("INSERT INTO peer_replies (message_id, user_id, text) VALUES (%s,%s,%s)", (message_id, user_id, text))
     conn.commit()
+    reply_id = cursor.lastrowid
     cursor.close()
     conn.close()
-    return jsonify({"ok": True})
+    peer_events.publish("reply", message_id=message_id, reply=peer_feed.serialize_reply(
+        {"id": reply_id, "user_id": user_id, "text": text}))
+    return jsonify({"ok": True, "id": reply_id})
 
 
 @app.route("/api/peer/react", methods=["POST"])
@@ -812,31 +1270,96 @@ def post_peer_react():
     message_id, emoji = data.get("message_id"), data.get("emoji")
     user_id = 1
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO peer_reactions (message_id, user_id, emoji) VALUES (%s,%s,%s)", (message_id, user_id, emoji))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return jsonify({"ok": True})
+    try:
+        count = reactions.react(conn, message_id, user_id, emoji)
+    finally:
+        conn.close()
+    # absolute count keeps the event idempotent for clients that already saw it in a snapshot
+    peer_events.publish("reaction", message_id=message_id, emoji=emoji, count=count)
+    return jsonify({"ok": True, "count": count})
+
+
+@app.cli.command("reactions-reconcile")
+def reactions_reconcile_command():
+    """Rebuild peer_reaction_counts from peer_reactions."""
+    conn = get_connection()
+    try:
+        checked, fixes = reactions.reconcile(conn)
+    finally:
+        conn.close()
+    for message_id, emoji, count in fixes:
+        print(f"⚠️ message {message_id} {emoji}: counter corrected to {count}")
+    print(f"✅ checked reactions of {checked} messages, {len(fixes)} counters corrected")
 
 
 @app.route("/api/peer/mood", methods=["POST"])
 def post_peer_mood():
     data = request.json
     mood = data.get("mood")
+    if not isinstance(mood, str) or not mood or len(mood) > 10:
+        return jsonify({"error": "mood must be a short non-empty string"}), 400
     user_id = 1
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("INSERT INTO peer_mood (user_id, mood) VALUES (%s,%s)", (user_id, mood))
     conn.commit()
+    mood_id = cursor.lastrowid
     cursor.close()
     conn.close()
+    # every worker's PEER_MOOD folds this in from the event log (no user id: summaries are anonymous)
+    peer_events.publish("mood", id=mood_id, mood=mood)
     return jsonify({"ok": True})
 
+
+@app.route("/api/peer/mood/summary", methods=["GET"])
+def peer_mood_summary():
+    return jsonify({"windows": PEER_MOOD.summary(get_connection)})
+
+
+@app.route("/api/admin/peer_mood", methods=["GET"])
+def admin_peer_mood():
+    return jsonify(PEER_MOOD.stats())
+
 @app.route("/resource-hub")
 def resource_hub():
     # Serve your static HTML file
     return send_from_directory("static", "resource_hub.html")
+
+
+# -----------------------------
+# Resource hub catalog (data/resources.json, reloaded when it changes)
+# -----------------------------
+RESOURCES = ResourceCatalog(os.path.join(BASE, "data", "resources.json"))
+RESOURCES_DIR = os.path.join(STATIC_DIR, "resources")
+# PDFs/audio rarely change; clients still revalidate with the ETag afterwards
+RESOURCE_MAX_AGE = int(os.getenv("RESOURCE_MAX_AGE", "86400"))
+
+
+@app.route("/api/resources", methods=["GET"])
+def list_resources():
+    # optional ?language=Hindi &type=pdf (case-insensitive)
+    snapshot = RESOURCES.current()
+    body, etag = snapshot.response(language=request.args.get("language"), type=request.args.get("type"))
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "public, max-age=300"
+    return resp
+
+
+@app.route("/api/resources/facets", methods=["GET"])
+def resource_facets():
+    return jsonify(RESOURCES.current().facets())
+
+
+@app.route("/static/resources/<path:filename>")
+@app.route("/resources/<path:filename>")
+def resource_file(filename):
+    # send_file answers Range requests with 206 (audio seeking, PDF viewers
+    # fetching pages) and If-None-Match / If-Modified-Since with 304
+    return send_from_directory(RESOURCES_DIR, filename, conditional=True, max_age=RESOURCE_MAX_AGE)
 # -----------------------------
 # Run app
 # -----------------------------
@@ -0,0 +1,73 @@
+-- Tables that used to be created by init_mysql_tables() / init_admin_table().
+-- IF NOT EXISTS so databases created before migrations adopt this version as-is.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(255) UNIQUE,
+    email VARCHAR(255) UNIQUE,
+    password VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS chat_logs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    message TEXT,
+    sentiment_score FLOAT,
+    sentiment_label VARCHAR(20),
+    suggestion TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS questionnaire_responses (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    stress_score FLOAT,
+    anxiety_score FLOAT,
+    depression_score FLOAT,
+    social_support FLOAT,
+    parental_relation FLOAT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS peer_messages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    text TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS peer_replies (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    message_id INT,
+    user_id INT,
+    text TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (message_id) REFERENCES peer_messages(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS peer_reactions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    message_id INT,
+    user_id INT,
+    emoji VARCHAR(10),
+    FOREIGN KEY (message_id) REFERENCES peer_messages(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS peer_mood (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    mood VARCHAR(10),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(255) UNIQUE,
+    password VARCHAR(255)
+);
@@ -0,0 +1,27 @@
+-- Running sums behind /api/admin/metrics (see backend/services/rollups.py).
+
+CREATE TABLE IF NOT EXISTS questionnaire_rollup_total (
+    id TINYINT PRIMARY KEY,
+    n BIGINT NOT NULL DEFAULT 0,
+    sum_stress DOUBLE NOT NULL DEFAULT 0,
+    sum_anxiety DOUBLE NOT NULL DEFAULT 0,
+    sum_depression DOUBLE NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS questionnaire_rollup_hourly (
+    bucket_start DATETIME PRIMARY KEY,
+    n INT NOT NULL DEFAULT 0,
+    sum_stress DOUBLE NOT NULL DEFAULT 0,
+    sum_anxiety DOUBLE NOT NULL DEFAULT 0,
+    sum_depression DOUBLE NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS questionnaire_rollup_user_daily (
+    user_id INT NOT NULL,
+    day DATE NOT NULL,
+    n INT NOT NULL DEFAULT 0,
+    sum_stress DOUBLE NOT NULL DEFAULT 0,
+    sum_anxiety DOUBLE NOT NULL DEFAULT 0,
+    sum_depression DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
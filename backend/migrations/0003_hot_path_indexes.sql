@@ -0,0 +1,26 @@
+-- Indexes for the hot read paths (checked by `flask db-check`).
+--
+-- /api/history                   chat_logs WHERE user_id [AND id < ? | id > ?] ORDER BY id
+-- /api/questionnaire/history     questionnaire_responses WHERE user_id [AND id ...] ORDER BY id
+-- /api/admin/history             chat_logs ORDER BY id (primary key)
+-- /api/admin/metrics             questionnaire_responses ORDER BY created_at DESC LIMIT 30
+-- /api/peer/messages             peer_messages by id (primary key), peer_replies by
+--                                message_id (foreign key index); reaction counts
+--                                come from peer_reaction_counts (0004)
+-- peer_reactions (message_id, emoji) is what `flask reactions-reconcile`
+-- groups by when it rebuilds those counters.
+--
+-- History pages by id (keyset) per user. An InnoDB secondary index on
+-- (user_id) is stored as (user_id, id), so it serves that order directly;
+-- (user_id, created_at) would not. The named (user_id) indexes replace the
+-- ones MySQL created implicitly for the foreign keys.
+
+CREATE INDEX idx_chat_logs_user ON chat_logs (user_id);
+DROP INDEX user_id ON chat_logs;
+
+CREATE INDEX idx_questionnaire_created ON questionnaire_responses (created_at);
+CREATE INDEX idx_questionnaire_user ON questionnaire_responses (user_id);
+DROP INDEX user_id ON questionnaire_responses;
+
+CREATE INDEX idx_peer_reactions_message_emoji ON peer_reactions (message_id, emoji);
+DROP INDEX message_id ON peer_reactions;
@@ -0,0 +1,26 @@
+-- Denormalized reaction counts for /api/peer/messages.
+--
+-- peer_reaction_counts holds one row per (message, emoji), bumped by an
+-- upsert in the same transaction as the peer_reactions insert, so reading a
+-- message's reactions is a primary-key range read however popular it is.
+-- peer_reactions keeps every raw row; `flask reactions-reconcile` rebuilds
+-- the counters from it. Nothing existing is changed, so reverting is just
+--   DROP TABLE peer_reaction_counts;
+--
+-- Reactions are not deduplicated per user yet: the peer routes don't know
+-- who is reacting (user_id is fixed to 1), and a unique key on user_id
+-- would cap every emoji at one.
+
+CREATE TABLE IF NOT EXISTS peer_reaction_counts (
+    message_id INT NOT NULL,
+    emoji VARCHAR(10) NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (message_id, emoji),
+    FOREIGN KEY (message_id) REFERENCES peer_messages(id) ON DELETE CASCADE
+);
+
+INSERT INTO peer_reaction_counts (message_id, emoji, count)
+SELECT message_id, emoji, COUNT(*) FROM peer_reactions
+WHERE message_id IS NOT NULL AND emoji IS NOT NULL
+GROUP BY message_id, emoji
+ON DUPLICATE KEY UPDATE count = VALUES(count);
@@ -0,0 +1,4 @@
+-- /api/peer/mood/summary seeds its sliding windows from the last day of
+-- peer_mood (WHERE created_at >= ?), once per worker and after log rotation.
+
+CREATE INDEX idx_peer_mood_created ON peer_mood (created_at);
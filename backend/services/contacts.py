@@ -0,0 +1,138 @@
+import bisect
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Row layout inside a catalog: (name, phone, location, link)
+FIELDS = ("name", "phone", "location", "link")
+
+
+def _tokens(text):
+    return {t.lower() for t in _WORD_RE.findall(text or "")}
+
+
+def parse_contacts(f):
+    """Rows of the providers CSV, with blanks filled in and "Unknown" names dropped."""
+    rows = []
+    for row in csv.DictReader(f):
+        name = (row.get("name") or "").strip()
+        if not name or name.lower() == "unknown":
+            continue
+        rows.append((
+            name,
+            (row.get("phone") or "").strip() or "N/A",
+            (row.get("location") or "").strip() or "N/A",
+            (row.get("link") or "").strip() or "#",
+        ))
+    return rows
+
+
+def to_json(rows):
+    return json.dumps([dict(zip(FIELDS, r)) for r in rows], ensure_ascii=False).encode("utf-8")
+
+
+class Catalog:
+    """
+    One immutable snapshot of the contacts file. The full list is serialized
+    once; filters use two indexes built at load time:
+      location word -> row numbers            (exact word, e.g. location=Delhi)
+      sorted (name word, row number) pairs    (prefix via bisect, e.g. q=apol)
+    """
+
+    def __init__(self, rows, version=""):
+        self.rows = rows
+        self.body = to_json(rows)
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()[:16]
+        self.version = version
+        self.by_location = {}
+        name_words = []
+        for i, (name, _phone, location, _link) in enumerate(rows):
+            for word in _tokens(location):
+                self.by_location.setdefault(word, []).append(i)
+            name_words.extend((word, i) for word in _tokens(name))
+        name_words.sort()
+        self._name_keys = [w for w, _ in name_words]
+        self._name_rows = [i for _, i in name_words]
+
+    def _name_prefix(self, prefix):
+        lo = bisect.bisect_left(self._name_keys, prefix)
+        hi = bisect.bisect_left(self._name_keys, prefix + "\uffff")
+        return set(self._name_rows[lo:hi])
+
+    def search(self, location=None, q=None, limit=None):
+        """Row numbers matching every location word and every name prefix in q, in file order."""
+        matches = None
+        for word in _tokens(location):
+            found = set(self.by_location.get(word, ()))
+            matches = found if matches is None else matches & found
+        for word in _tokens(q):
+            found = self._name_prefix(word)
+            matches = found if matches is None else matches & found
+        if matches is None:
+            matches = range(len(self.rows))
+        result = sorted(matches)
+        return result[:limit] if limit else result
+
+    def filtered_json(self, location=None, q=None, limit=None):
+        return to_json([self.rows[i] for i in self.search(location, q, limit)])
+
+
+class ContactsCatalog:
+    """
+    Loads the providers CSV once and reloads it when its mtime changes
+    (checked at most every check_interval seconds). A missing or broken file
+    leaves the previous catalog (or an empty one) in place.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._catalog = Catalog([])
+        self._checked = float("-inf")
+        self.reloads = 0
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    self._maybe_reload()
+        return self._catalog
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is not None:
+                print("⚠️ contacts file missing, keeping previous catalog:", self.path)
+                self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            with open(self.path, encoding="utf-8", newline="") as f:
+                self._catalog = Catalog(parse_contacts(f), version=str(mtime))
+            self.reloads += 1
+        except Exception as e:
+            print("⚠️ contacts reload failed, keeping previous catalog:", e)
+
+    def stats(self):
+        catalog = self.current()
+        return {
+            "contacts": len(catalog.rows),
+            "locations": len(catalog.by_location),
+            "reloads": self.reloads,
+            "etag": catalog.etag,
+            "mtime": catalog.version,
+            "bytes": len(catalog.body),
+        }
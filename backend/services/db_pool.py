@@ -0,0 +1,186 @@
+import os
+import queue
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a raw DB-API connection. Everything is delegated to the
+    real connection except close(), which hands it back to the pool instead.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Connections leaked by a handler (early return without close) still find their way back.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Per-process pool of reusable connections.
+
+    - size: idle connections kept around for reuse
+    - max_overflow: extra connections opened under burst, closed on release
+    - timeout: seconds to wait for a free connection before PoolTimeout
+    - recycle: connections older than this (seconds) are reopened
+    - pre_ping: check a connection is still alive before handing it out
+    """
+
+    def __init__(self, connect, size=5, max_overflow=10, timeout=10.0, recycle=1800, pre_ping=True):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size + self.max_overflow)
+        self._open = 0
+        self._metrics = {
+            "checkouts": 0,
+            "connects": 0,
+            "reused": 0,
+            "discarded_stale": 0,
+            "discarded_broken": 0,
+            "overflow_closed": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+        }
+
+    def _check_fork(self):
+        # gunicorn forks workers after import; never share sockets with the parent.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    def _new_raw(self):
+        raw = self._connect()
+        with self._lock:
+            self._open += 1
+            self._metrics["connects"] += 1
+        return raw, time.monotonic()
+
+    def _discard(self, raw, reason):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open -= 1
+            self._metrics[reason] += 1
+
+    def _is_alive(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def get(self):
+        self._check_fork()
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise PoolTimeout("no database connection available within %.1fs" % self.timeout)
+
+        try:
+            while True:
+                try:
+                    raw, created_at = self._idle.get_nowait()
+                except queue.Empty:
+                    raw, created_at = self._new_raw()
+                    break
+                if self.recycle and time.monotonic() - created_at > self.recycle:
+                    self._discard(raw, "discarded_stale")
+                    continue
+                if self.pre_ping and not self._is_alive(raw):
+                    self._discard(raw, "discarded_broken")
+                    continue
+                with self._lock:
+                    self._metrics["reused"] += 1
+                break
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_seconds_total"] += time.monotonic() - start
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at):
+        if self._pid != os.getpid():
+            # Checked out before a fork; the socket belongs to the parent.
+            return
+        try:
+            try:
+                # End any open transaction so the next borrower never sees an old snapshot.
+                raw.rollback()
+            except Exception:
+                self._discard(raw, "discarded_broken")
+                return
+            if self._idle.qsize() >= self.size:
+                self._discard(raw, "overflow_closed")
+                return
+            self._idle.put((raw, created_at))
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        self._check_fork()
+        with self._lock:
+            data = dict(self._metrics)
+            data["open"] = self._open
+        data["idle"] = self._idle.qsize()
+        data["in_use"] = data["open"] - data["idle"]
+        data["size"] = self.size
+        data["max_overflow"] = self.max_overflow
+        data["timeout"] = self.timeout
+        data["pid"] = self._pid
+        return data
+
+
+def pool_from_env(connect):
+    return ConnectionPool(
+        connect,
+        size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pre_ping=os.getenv("DB_POOL_PRE_PING", "1") != "0",
+    )
@@ -0,0 +1,311 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+
+class QueueFull(Exception):
+    pass
+
+
+# -----------------------------
+# Worker-process side
+# -----------------------------
+_DEEPFACE = None
+_EMOTION_MODEL = None
+
+
+def _worker_init():
+    """
+    Runs once in every pool process: import DeepFace and build the emotion
+    model so the first real batch doesn't pay for it.
+    """
+    global _DEEPFACE, _EMOTION_MODEL
+    from deepface import DeepFace
+    _DEEPFACE = DeepFace
+    try:
+        try:
+            client = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+        except TypeError:
+            client = DeepFace.build_model("Emotion")
+        _EMOTION_MODEL = getattr(client, "model", client)
+    except Exception as e:
+        print("⚠️ emotion model warm-up failed, using DeepFace.analyze per frame:", e)
+        _EMOTION_MODEL = None
+
+
+def _ping():
+    return os.getpid()
+
+
+def _emotion_input(face_bgr):
+    import cv2
+    import numpy as np
+    gray = cv2.cvtColor(face_bgr.astype(np.float32), cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (48, 48))
+
+
+def _detect_face(frame, detector_backend):
+    faces = _DEEPFACE.extract_faces(frame, detector_backend=detector_backend, enforce_detection=False)
+    # RGB [0,1] -> BGR, same as DeepFace.analyze
+    return faces[0]["face"][:, :, ::-1], faces[0].get("facial_area")
+
+
+def _analyze_single(frame, detect, detector_backend):
+    analysis = _DEEPFACE.analyze(frame, actions=["emotion"], enforce_detection=False,
+                                 detector_backend=detector_backend if detect else "skip")
+    return {"dominant_emotion": analysis[0]["dominant_emotion"], "emotion": analysis[0]["emotion"],
+            "region": analysis[0].get("region") if detect else None}
+
+
+def analyze_batch(items, detector_backend="opencv"):
+    """
+    items: [(frame, detect), ...]. Frames with detect=True go through the face
+    detector; detect=False frames are already face crops. All faces then go
+    through a single forward pass of the emotion model. Falls back to
+    per-frame DeepFace.analyze when the model couldn't be built directly.
+    """
+    if _DEEPFACE is None:
+        _worker_init()
+    started = time.perf_counter()
+    if _EMOTION_MODEL is None:
+        results = [_analyze_single(f, d, detector_backend) for f, d in items]
+        elapsed = time.perf_counter() - started
+        for r in results:
+            r["timings"] = {"detect": 0.0, "model": elapsed}
+        return results
+
+    import numpy as np
+    faces, regions = [], []
+    for frame, detect in items:
+        if detect:
+            face, region = _detect_face(frame, detector_backend)
+        else:
+            face, region = frame / 255.0, None
+        faces.append(_emotion_input(face))
+        regions.append(region)
+    detected = time.perf_counter()
+    preds = _EMOTION_MODEL.predict(np.stack(faces)[..., np.newaxis], verbose=0)
+    done = time.perf_counter()
+
+    results = []
+    for p, region in zip(preds, regions):
+        total = float(p.sum()) or 1.0
+        scores = {label: 100.0 * float(v) / total for label, v in zip(EMOTION_LABELS, p)}
+        results.append({"dominant_emotion": EMOTION_LABELS[int(p.argmax())], "emotion": scores,
+                        "region": region,
+                        "timings": {"detect": (detected - started) / len(items), "model": done - detected}})
+    return results
+
+
+# -----------------------------
+# Request side (runs inside the web worker)
+# -----------------------------
+class _Job:
+    __slots__ = ("frame", "future", "deadline", "enqueued")
+
+    def __init__(self, frame, timeout):
+        self.frame = frame
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.deadline = self.enqueued + timeout
+
+
+class EmotionService:
+    """
+    Bounded queue in front of a process pool. A dispatcher thread groups
+    queued frames into micro-batches (up to max_batch frames, waiting at most
+    max_wait seconds for the batch to fill) and ships each batch to a pool
+    process that keeps the model warm.
+    """
+
+    def __init__(self, workers=1, max_batch=8, max_wait=0.02, queue_size=32, timeout=10.0,
+                 detector_backend="opencv", analyze=analyze_batch, initializer=_worker_init):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.detector_backend = detector_backend
+        self._analyze = analyze
+        self._initializer = initializer
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._inflight = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._dispatcher = None
+        self._pid = None
+        self._metrics = {
+            "requests": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "expired": 0,
+            "errors": 0,
+            "pool_restarts": 0,
+            "batches": 0,
+            "frames": 0,
+            "batch_seconds_total": 0.0,
+            "batch_seconds_max": 0.0,
+            "last_batch_size": 0,
+            "last_batch_seconds": 0.0,
+            "queue_wait_seconds_total": 0.0,
+        }
+
+    def _ensure_started(self):
+        # started lazily (and again after a fork) so importing the app never spawns processes
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._executor = self._new_executor()
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="emotion-dispatcher", daemon=True)
+            self._dispatcher.start()
+            self._pid = os.getpid()
+
+    def _new_executor(self):
+        ctx = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=self._initializer)
+
+    def _restart_pool(self, broken):
+        """Replace a pool whose worker died (BrokenProcessPool); later batches go to the new one."""
+        with self._lock:
+            if self._executor is not broken:
+                return  # already replaced
+            print("⚠️ emotion worker process died, restarting the pool")
+            self._executor = self._new_executor()
+            self._metrics["pool_restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self, timeout=120.0):
+        """
+        Start the pool processes now (each loads the model in its initializer)
+        instead of on the first /api/emotion request.
+        """
+        self._ensure_started()
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        return sorted({f.result(timeout=timeout) for f in futures})
+
+    def submit(self, frame, detect=True):
+        self._ensure_started()
+        job = _Job((frame, detect), self.timeout)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise QueueFull("emotion queue is full (%d pending)" % self._queue.qsize())
+        with self._lock:
+            self._metrics["requests"] += 1
+        return job.future
+
+    def analyze(self, frame, detect=True):
+        """
+        Blocking helper for request handlers. Raises QueueFull or
+        concurrent.futures.TimeoutError.
+        """
+        future = self.submit(frame, detect)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise
+
+    def _collect(self):
+        first = self._queue.get()
+        jobs = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(jobs) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                jobs.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        now = time.monotonic()
+        live = []
+        for j in jobs:
+            if not j.future.set_running_or_notify_cancel():
+                continue  # cancelled by its caller
+            if now >= j.deadline:
+                # resolve it so callers and callbacks without their own timeout don't wait forever
+                j.future.set_exception(FutureTimeout("emotion analysis expired in the queue"))
+                with self._lock:
+                    self._metrics["expired"] += 1
+                continue
+            live.append(j)
+        return live
+
+    def _dispatch_loop(self):
+        while True:
+            self._inflight.acquire()
+            jobs = self._collect()
+            if not jobs:
+                self._inflight.release()
+                continue
+            started = time.monotonic()
+            executor = self._executor
+            try:
+                batch = executor.submit(self._analyze, [j.frame for j in jobs], self.detector_backend)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._restart_pool(executor)
+                self._inflight.release()
+                for j in jobs:
+                    j.future.set_exception(e)
+                continue
+            batch.add_done_callback(
+                lambda f, jobs=jobs, started=started, executor=executor: self._finish(f, jobs, started, executor))
+
+    def _finish(self, batch, jobs, started, executor):
+        self._inflight.release()
+        elapsed = time.monotonic() - started
+        with self._lock:
+            m = self._metrics
+            m["batches"] += 1
+            m["frames"] += len(jobs)
+            m["batch_seconds_total"] += elapsed
+            m["batch_seconds_max"] = max(m["batch_seconds_max"], elapsed)
+            m["last_batch_size"] = len(jobs)
+            m["last_batch_seconds"] = elapsed
+            m["queue_wait_seconds_total"] += sum(started - j.enqueued for j in jobs)
+        try:
+            results = batch.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(executor)
+            with self._lock:
+                self._metrics["errors"] += 1
+            for j in jobs:
+                j.future.set_exception(e)
+            return
+        for j, r in zip(jobs, results):
+            j.future.set_result(r)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._metrics)
+        data["queue_depth"] = self._queue.qsize()
+        data["avg_batch_size"] = data["frames"] / data["batches"] if data["batches"] else 0.0
+        data["avg_batch_seconds"] = data["batch_seconds_total"] / data["batches"] if data["batches"] else 0.0
+        data.update(workers=self.workers, max_batch=self.max_batch, max_wait=self.max_wait,
+                    queue_size=self._queue.maxsize, timeout=self.timeout)
+        return data
+
+
+def service_from_env():
+    return EmotionService(
+        workers=int(os.getenv("EMOTION_WORKERS", "1")),
+        max_batch=int(os.getenv("EMOTION_MAX_BATCH", "8")),
+        max_wait=float(os.getenv("EMOTION_MAX_WAIT_MS", "20")) / 1000.0,
+        queue_size=int(os.getenv("EMOTION_QUEUE_SIZE", "32")),
+        timeout=float(os.getenv("EMOTION_TIMEOUT", "10")),
+        detector_backend=os.getenv("EMOTION_DETECTOR", "opencv"),
+    )
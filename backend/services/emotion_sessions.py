@@ -0,0 +1,264 @@
+import os
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+
+from backend.services.emotion_service import EMOTION_LABELS, QueueFull
+from backend.services.frames import decode_image, FrameError, MAX_FRAME_BYTES
+from backend.services.preprocess import StageTimer
+
+# Upload framing for /api/emotion/session/<id>/frames (application/octet-stream):
+#   repeated [uint32 big-endian length][float64 big-endian client timestamp in ms][JPEG/PNG bytes]
+FRAME_HEADER = struct.Struct(">Id")
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+def iter_framed(stream):
+    """Yield (timestamp_seconds, image_bytes) from a length-prefixed upload as it arrives."""
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            raise FrameError("truncated frame header")
+        length, ts_ms = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME_BYTES:
+            raise FrameError("frame larger than %d bytes" % MAX_FRAME_BYTES)
+        data = stream.read(length)
+        if len(data) < length:
+            raise FrameError("truncated frame")
+        yield ts_ms / 1000.0, data
+
+
+class EmotionSession:
+    """
+    One camera session. Frames are sampled at most every sample_interval
+    seconds (by client timestamp); at most max_pending frames may be in the
+    model at once and anything beyond that is dropped, never queued (a frame
+    that isn't back within the service timeout frees its slot anyway). Results
+    are grouped into windows of window_seconds, averaged, and smoothed with an
+    exponential moving average across windows.
+    """
+
+    def __init__(self, service, preprocessor, sample_interval=0.5, window_seconds=2.0,
+                 smoothing=0.5, max_pending=2, history=30):
+        self.id = uuid.uuid4().hex
+        self.service = service
+        self.preprocessor = preprocessor
+        self.sample_interval = sample_interval
+        self.window_seconds = window_seconds
+        self.smoothing = smoothing
+        self.max_pending = max_pending
+        self.windows = deque(maxlen=history)
+        self.last_seen = time.monotonic()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pending = 0
+        self._inflight = {}  # future -> monotonic deadline
+        self._last_sampled = None
+        self._window_start = None
+        self._window_sum = None
+        self._window_frames = 0
+        self._smoothed = None
+        self.counters = {"received": 0, "sampled": 0, "analyzed": 0,
+                         "dropped_sampling": 0, "dropped_overload": 0, "errors": 0, "expired": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def offer(self, ts, image_bytes):
+        """Sample, decode and submit one frame. Returns the model future, or None if dropped."""
+        self.last_seen = time.monotonic()
+        with self._lock:
+            expired = self._reap_expired()
+        for future in expired:
+            future.cancel()  # outside the lock: cancel() runs _on_result
+        with self._lock:
+            self.counters["received"] += 1
+            if self._last_sampled is not None and 0 <= ts - self._last_sampled < self.sample_interval:
+                self.counters["dropped_sampling"] += 1
+                return None
+            if self._pending >= self.max_pending:
+                self.counters["dropped_overload"] += 1
+                return None
+            self._last_sampled = ts
+            self._pending += 1
+            self.counters["sampled"] += 1
+
+        try:
+            frame = decode_image(image_bytes)
+            face_input, shape, detect = self.preprocessor.prepare(frame, "session:" + self.id, StageTimer())
+            future = self.service.submit(face_input, detect)
+        except QueueFull:
+            with self._lock:
+                self._pending -= 1
+                self.counters["dropped_overload"] += 1
+            return None
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self.counters["errors"] += 1
+            return None
+        with self._lock:
+            self._inflight[future] = time.monotonic() + self.service.timeout
+        future.add_done_callback(lambda f: self._on_result(f, ts, shape))
+        return future
+
+    def _reap_expired(self):
+        # caller holds self._lock; frees slots of frames the service never answered
+        now = time.monotonic()
+        expired = [f for f, deadline in self._inflight.items() if now >= deadline]
+        for future in expired:
+            del self._inflight[future]
+            self._pending -= 1
+            self.counters["expired"] += 1
+        return expired
+
+    def _on_result(self, future, ts, shape):
+        with self._lock:
+            if self._inflight.pop(future, None) is None:
+                return  # already reaped as expired
+            self._pending -= 1
+        try:
+            result = future.result()
+        except Exception:
+            self._count("errors")
+            return
+        self.preprocessor.remember("session:" + self.id, shape, result.get("region"))
+        scores = [float(result["emotion"].get(label, 0.0)) for label in EMOTION_LABELS]
+        with self._lock:
+            self.counters["analyzed"] += 1
+            if self._window_start is None:
+                self._window_start = ts
+            elif ts - self._window_start >= self.window_seconds:
+                self._close_window()
+                self._window_start = ts
+            if self._window_sum is None:
+                self._window_sum = [0.0] * len(EMOTION_LABELS)
+            self._window_sum = [a + b for a, b in zip(self._window_sum, scores)]
+            self._window_frames += 1
+
+    def _distribution(self):
+        return [v / self._window_frames for v in self._window_sum]
+
+    def _close_window(self):
+        # caller holds self._lock
+        if not self._window_frames:
+            return
+        dist = self._distribution()
+        if self._smoothed is None:
+            self._smoothed = dist
+        else:
+            a = self.smoothing
+            self._smoothed = [a * d + (1 - a) * s for d, s in zip(dist, self._smoothed)]
+        self._seq += 1
+        self.windows.append({
+            "seq": self._seq,
+            "start": self._window_start,
+            "frames": self._window_frames,
+            "distribution": dict(zip(EMOTION_LABELS, dist)),
+            "smoothed": dict(zip(EMOTION_LABELS, self._smoothed)),
+            "dominant": EMOTION_LABELS[max(range(len(EMOTION_LABELS)), key=self._smoothed.__getitem__)],
+        })
+        self._window_sum = None
+        self._window_frames = 0
+
+    def snapshot(self, since=0):
+        with self._lock:
+            current = None
+            if self._window_frames:
+                dist = self._distribution()
+                current = {"start": self._window_start, "frames": self._window_frames,
+                           "distribution": dict(zip(EMOTION_LABELS, dist))}
+            return {
+                "session_id": self.id,
+                "windows": [w for w in self.windows if w["seq"] > since],
+                "current": current,
+                "pending": self._pending,
+                "counters": dict(self.counters),
+            }
+
+    def close(self):
+        with self._lock:
+            self._close_window()
+        return self.snapshot()
+
+
+# client-tunable session options -> largest accepted value (seconds)
+SESSION_OPTION_LIMITS = {"sample_interval": 60.0, "window_seconds": 300.0}
+
+
+def _session_option(name, value):
+    value = float(value)  # TypeError / ValueError for anything non-numeric
+    if not 0 < value <= SESSION_OPTION_LIMITS[name]:
+        raise ValueError("%s must be > 0 and <= %g" % (name, SESSION_OPTION_LIMITS[name]))
+    return value
+
+
+class SessionManager:
+    """
+    Sessions live in the worker process that created them; idle ones expire
+    after idle_timeout seconds.
+    """
+
+    def __init__(self, service, preprocessor, idle_timeout=120.0, max_sessions=256, **session_defaults):
+        self.service = service
+        self.preprocessor = preprocessor
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.session_defaults = session_defaults
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for sid in [sid for sid, s in self._sessions.items() if s.last_seen < cutoff]:
+            del self._sessions[sid]
+
+    def create(self, **overrides):
+        options = dict(self.session_defaults)
+        options.update({k: _session_option(k, v) for k, v in overrides.items() if v is not None})
+        session = EmotionSession(self.service, self.preprocessor, **options)
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                raise QueueFull("too many active emotion sessions")
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFound(session_id)
+        return session
+
+    def end(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFound(session_id)
+        return session.close()
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {"active_sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+
+def sessions_from_env(service, preprocessor):
+    return SessionManager(
+        service, preprocessor,
+        idle_timeout=float(os.getenv("EMOTION_SESSION_IDLE_TIMEOUT", "120")),
+        max_sessions=int(os.getenv("EMOTION_MAX_SESSIONS", "256")),
+        sample_interval=float(os.getenv("EMOTION_SESSION_SAMPLE_INTERVAL", "0.5")),
+        window_seconds=float(os.getenv("EMOTION_SESSION_WINDOW", "2.0")),
+        smoothing=float(os.getenv("EMOTION_SESSION_SMOOTHING", "0.5")),
+        max_pending=int(os.getenv("EMOTION_SESSION_MAX_PENDING", "2")),
+    )
@@ -0,0 +1,87 @@
+import base64
+import os
+
+MAX_FRAME_BYTES = int(os.getenv("MAX_FRAME_BYTES", str(8 * 1024 * 1024)))
+
+
+class FrameError(ValueError):
+    pass
+
+
+class FrameTooLarge(FrameError):
+    pass
+
+
+def decode_image(buf):
+    """
+    Decode JPEG/PNG bytes into a BGR frame. `buf` may be bytes, bytearray or
+    memoryview; np.frombuffer wraps it without copying.
+    """
+    import cv2
+    import numpy as np
+    frame = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise FrameError("could not decode image")
+    return frame
+
+
+def _read_stream(stream, length):
+    # read straight into one preallocated buffer instead of concatenating chunks
+    if length is not None and length > MAX_FRAME_BYTES:
+        raise FrameTooLarge("frame larger than %d bytes" % MAX_FRAME_BYTES)
+    if length is None:
+        data = stream.read(MAX_FRAME_BYTES + 1)
+        if len(data) > MAX_FRAME_BYTES:
+            raise FrameTooLarge("frame larger than %d bytes" % MAX_FRAME_BYTES)
+        return data
+    buf = bytearray(length)
+    view = memoryview(buf)
+    readinto = getattr(stream, "readinto", None)
+    pos = 0
+    while pos < length:
+        if readinto:
+            n = readinto(view[pos:])
+        else:
+            chunk = stream.read(length - pos)
+            n = len(chunk)
+            view[pos:pos + n] = chunk
+        if not n:
+            break
+        pos += n
+    return view[:pos]
+
+
+def frame_bytes_from_request(request):
+    """
+    Raw encoded image bytes from any of the supported upload modes:
+      - multipart/form-data with an `image` (or first) file field
+      - application/octet-stream or image/* body
+      - JSON {"image": "data:image/...;base64,..."} (original contract)
+    """
+    mimetype = request.mimetype or ""
+    if mimetype == "multipart/form-data":
+        f = request.files.get("image") or next(iter(request.files.values()), None)
+        if f is None:
+            raise FrameError("missing image file")
+        if hasattr(f.stream, "getbuffer"):
+            # small parts are already buffered in memory by the form parser
+            buf = f.stream.getbuffer()
+            if len(buf) > MAX_FRAME_BYTES:
+                raise FrameTooLarge("frame larger than %d bytes" % MAX_FRAME_BYTES)
+            return buf
+        return _read_stream(f.stream, f.content_length or None)
+    if mimetype == "application/octet-stream" or mimetype.startswith("image/"):
+        return _read_stream(request.stream, request.content_length)
+
+    payload = request.get_json(silent=True) or {}
+    data = payload.get("image")
+    if not data:
+        raise FrameError("missing image")
+    # strip the data-URL prefix without a regex pass over the whole payload
+    if data.startswith("data:"):
+        data = data[data.find(",") + 1:]
+    return base64.b64decode(data)
+
+
+def frame_from_request(request):
+    return decode_image(frame_bytes_from_request(request))
@@ -0,0 +1,229 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class HistoryQuery:
+    """
+    Keyset-paged, per-user reads of an append-only table (chat_logs,
+    questionnaire_responses). Pages are newest first and keyed on the
+    AUTO_INCREMENT id, which follows insert order:
+      before=<id>  older rows, for scrolling back
+      since=<id>   only rows newer than the client already has
+    fields maps public field names to columns; clients pick a subset with
+    ?fields=a,b and get default_fields otherwise.
+    """
+
+    def __init__(self, table, fields, default_fields, default_limit, max_limit, formatters=None):
+        self.table = table
+        self.fields = fields
+        self.default_fields = default_fields
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.formatters = formatters or {}
+
+    def parse_fields(self, raw):
+        if not raw:
+            return list(self.default_fields)
+        names = [f.strip() for f in raw.split(",") if f.strip()]
+        unknown = [f for f in names if f not in self.fields]
+        if unknown:
+            raise ValueError("unknown field(s): %s" % ", ".join(unknown))
+        return names
+
+    def _scope(self, user_id):
+        if user_id is None:
+            return "", ()
+        return "user_id=%s", (user_id,)
+
+    def latest_id(self, cursor, user_id=None):
+        where, params = self._scope(user_id)
+        cursor.execute(f"SELECT MAX(id) AS latest FROM {self.table}" + (f" WHERE {where}" if where else ""), params)
+        row = cursor.fetchone()
+        latest = row["latest"] if isinstance(row, dict) else row[0]
+        return int(latest or 0)
+
+    def fetch(self, cursor, fields, user_id=None, limit=None, before=None, since=None):
+        limit = max(1, min(int(limit or self.default_limit), self.max_limit))
+        columns = ", ".join(f"{self.fields[f]} AS {f}" for f in fields if f != "id")
+        columns = "id" + (", " + columns if columns else "")
+        conditions, params = [], []
+        where, scope = self._scope(user_id)
+        if where:
+            conditions.append(where)
+            params.extend(scope)
+        if since is not None:
+            conditions.append("id > %s")
+            params.append(since)
+            order = "ASC"  # oldest new rows first so a full page doesn't skip any; reversed below
+        else:
+            if before is not None:
+                conditions.append("id < %s")
+                params.append(before)
+            order = "DESC"
+        sql = f"SELECT {columns} FROM {self.table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY id {order} LIMIT %s"
+        params.append(limit)
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+        if since is not None:
+            rows.reverse()
+        return rows, len(rows) == limit
+
+    def serialize(self, rows, fields):
+        out = []
+        for r in rows:
+            item = {}
+            for f in fields:
+                value = r[f]
+                fmt = self.formatters.get(f)
+                item[f] = fmt(value) if fmt and value is not None else value
+            out.append(item)
+        return out
+
+
+class RecentHistory:
+    """
+    Per-user cache of the newest rows of one HistoryQuery, newest first, so
+    dashboard reads don't touch MySQL. Filled on a miss, extended by add()
+    when this process writes a row. Entries are per worker process; the ttl
+    bounds how long a worker can miss rows written by another, and a client
+    cursor newer than the entry (?since= after its own submit) forces a reload.
+    """
+
+    def __init__(self, query, per_user=90, max_users=1024, ttl=30.0):
+        self.query = query
+        self.per_user = per_user
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (loaded_at, complete, rows)
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "loads": 0, "appends": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def load(self, cursor, user_id):
+        rows, more = self.query.fetch(cursor, list(self.query.fields), user_id, self.per_user)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), not more, rows)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+            self.counters["loads"] += 1
+
+    def add(self, user_id, row):
+        """Record a row this process just committed (keys are the public field names)."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            loaded_at, complete, rows = entry
+            rows = [row] + [r for r in rows if r["id"] != row["id"]]
+            if len(rows) > self.per_user:
+                rows, complete = rows[:self.per_user], False
+            self._entries[user_id] = (loaded_at, complete, rows)
+            self.counters["appends"] += 1
+
+    def latest_id(self, user_id, since=None):
+        """Newest id known for user_id, or None when the entry is missing, expired or behind since."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[user_id]
+                entry = None
+        if entry is None:
+            return None
+        latest = entry[2][0]["id"] if entry[2] else 0
+        if since is not None and since > latest:
+            return None
+        return latest
+
+    def page(self, user_id, limit=None, before=None, since=None):
+        """
+        (rows, more) from the cache, or None when the cached rows can't
+        answer the request exactly (missing entry, or the page reaches past
+        the oldest cached row).
+        """
+        limit = max(1, min(int(limit or self.query.default_limit), self.query.max_limit))
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            self._count("misses")
+            return None
+        _, complete, rows = entry
+        if since is not None:
+            newer = [r for r in rows if r["id"] > since]
+            if len(newer) == len(rows) and not complete and rows:
+                self._count("misses")  # the gap may extend past the cached rows
+                return None
+            result, more = newer[-limit:], len(newer) > limit
+        else:
+            older = [r for r in rows if before is None or r["id"] < before]
+            if len(older) < limit and not complete:
+                self._count("misses")
+                return None
+            result, more = older[:limit], len(older) > limit or (len(older) == limit and not complete)
+        self._count("hits")
+        return result, more
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["users"] = len(self._entries)
+        return data
+
+
+def make_etag(latest_id, *parts):
+    """Weak validator: changes whenever a row is added to the scope or the query changes."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:12]
+    return 'W/"%d-%s"' % (latest_id, digest)
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+def isoformat(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+CHAT_HISTORY = HistoryQuery(
+    "chat_logs",
+    fields={
+        "id": "id",
+        "user_id": "user_id",
+        "text": "message",
+        "score": "sentiment_score",
+        "label": "sentiment_label",
+        "suggestion": "suggestion",
+        "created_at": "created_at",
+    },
+    default_fields=["id", "user_id", "text", "score", "label", "suggestion", "created_at"],
+    default_limit=200,
+    max_limit=500,
+)
+
+QUESTIONNAIRE_HISTORY = HistoryQuery(
+    "questionnaire_responses",
+    fields={
+        "id": "id",
+        "timestamp": "created_at",
+        "stress": "stress_score",
+        "anxiety": "anxiety_score",
+        "depression": "depression_score",
+        "social": "social_support",
+        "parental": "parental_relation",
+    },
+    default_fields=["timestamp", "stress", "anxiety", "depression"],
+    default_limit=365,
+    max_limit=1000,
+    formatters={"timestamp": isoformat},
+)
@@ -1,25 +1,143 @@
+import itertools
 import os
-try:
-    import joblib
-except Exception:
-    joblib = None
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model", "trained_model.joblib")
+from backend.services.model_registry import MODELS
+from backend.services.model_store import model_store_from_env
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "ml_model")
+MODEL_PATH = os.path.join(MODEL_DIR, "trained_model.joblib")
+
+# labels of the rule-based fallback, in score order
+FALLBACK_LABELS = ("low", "moderate", "high")
+DEFAULT_CHUNK = 4096
+
+# ml_model/versions/*.joblib (newest wins) or trained_model.joblib, hot-swapped
+MODEL_STORE = model_store_from_env(MODEL_DIR)
 
 def load_model():
-    if joblib and os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
+    return MODEL_STORE.model()
 
-MODEL = load_model()
+# first load on first prediction (or by MODELS.warm_up()), not at import; the
+# registry only records that load, later versions are picked up by the store
+MODELS.register("risk_model", lambda: MODEL_STORE.refresh())
+
+def get_model():
+    MODELS.get("risk_model")
+    return MODEL_STORE.model()
 
 def predict_from_features(features):
-    if MODEL:
-        return MODEL.predict([features])[0]
+    model = get_model()
+    if model:
+        return model.predict([features])[0]
     # fallback rule-based placeholder
     s = sum(features) if isinstance(features, (list,tuple)) else 0
     if s>10:
         return "high"
     elif s>5:
         return "moderate"
-    return "low"
\ No newline at end of file
+    return "low"
+
+
+# -----------------------------
+# Batch prediction
+# -----------------------------
+def iter_chunks(rows, chunk_size=DEFAULT_CHUNK):
+    """
+    2-D float arrays of at most chunk_size rows. A 2-D array is sliced
+    (views, no copy); any other iterable of rows is consumed lazily, so a
+    generator over a large cohort never has to be materialised.
+    """
+    import numpy as np
+
+    if isinstance(rows, np.ndarray):
+        if rows.ndim != 2:
+            raise ValueError("expected a 2-D array of feature rows")
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+        return
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, chunk_size))
+        if not chunk:
+            return
+        yield np.asarray(chunk, dtype=float)
+
+def rule_based_batch(X):
+    """Vectorised predict_from_features fallback: the same thresholds on row sums."""
+    import numpy as np
+
+    s = X.sum(axis=1)
+    return np.asarray(FALLBACK_LABELS, dtype=object)[(s > 5).astype(int) + (s > 10)]
+
+def rule_based_proba(X):
+    """One-hot 'probabilities' over FALLBACK_LABELS, so callers can treat both paths alike."""
+    import numpy as np
+
+    s = X.sum(axis=1)
+    out = np.zeros((len(X), len(FALLBACK_LABELS)))
+    out[np.arange(len(X)), (s > 5).astype(int) + (s > 10)] = 1.0
+    return out
+
+def classes(model=None):
+    """Column order of predict_batch(..., proba=True)."""
+    model = model if model is not None else get_model()
+    if model is not None and hasattr(model, "classes_"):
+        return list(model.classes_)
+    return list(FALLBACK_LABELS)
+
+def _predict_chunk(model, X, proba):
+    if model is None:
+        return rule_based_proba(X) if proba else rule_based_batch(X)
+    return model.predict_proba(X) if proba else model.predict(X)
+
+def predict_batch(rows, chunk_size=DEFAULT_CHUNK, proba=False, model=None):
+    """
+    Stream predictions (or class probabilities, see classes()) for rows,
+    one array per chunk, in input order. One vectorised model call per chunk
+    instead of one per row.
+    """
+    model = model if model is not None else get_model()
+    for X in iter_chunks(rows, chunk_size):
+        yield _predict_chunk(model, X, proba)
+
+def predict_many(rows, chunk_size=DEFAULT_CHUNK, proba=False, model=None):
+    """predict_batch collected into a single array."""
+    import numpy as np
+
+    parts = list(predict_batch(rows, chunk_size, proba, model))
+    if not parts:
+        return np.empty((0, len(classes(model))) if proba else 0)
+    return np.concatenate(parts)
+
+
+# -----------------------------
+# Process-pool sharding for very large inputs
+# -----------------------------
+_SHARD_MODEL = None
+
+def _shard_init():
+    global _SHARD_MODEL
+    _SHARD_MODEL = load_model()
+
+def _shard_predict(X, proba):
+    return _predict_chunk(_SHARD_MODEL, X, proba)
+
+def predict_sharded(rows, workers=None, chunk_size=DEFAULT_CHUNK * 4, proba=False):
+    """
+    Like predict_batch, but chunks are scored in a pool of worker processes
+    (each loads the model once). Worth it only when a chunk takes much longer
+    to score than to pickle, i.e. large inputs and heavy models. Results
+    still come back in input order; at most 2 * workers chunks are in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_shard_init) as pool:
+        pending = []
+        for X in iter_chunks(rows, chunk_size):
+            pending.append(pool.submit(_shard_predict, X, proba))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
@@ -0,0 +1,307 @@
+import bisect
+import collections
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, n=1):
+        with self._lock:
+            self._values[labels] += n
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, s in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.label_names, labels, [('le', '+Inf')])} {s[-1]}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(s[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {s[-1]}"
+
+
+class RequestStats:
+    """DB calls made by one request, for the per-request histogram and Server-Timing."""
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.db_calls = 0
+        self.db_seconds = 0.0
+
+
+class Metrics:
+    """
+    Per-process instrumentation rendered in the Prometheus text format.
+
+    begin_request()/end_request() bracket a request (Flask before/after
+    hooks); DB calls made through instrument_connection() and stage()
+    blocks in between are attributed to its route. Work outside a request
+    (write-behind flushes, startup) is labelled route="-". Each gunicorn
+    worker keeps its own numbers, like the /api/admin/* stats, so scrape
+    every worker (or run one per pod) to see them all.
+
+    collect(prefix, fn) adds numeric fields of fn() (e.g. DB_POOL.stats)
+    as gauges at render time.
+    """
+
+    def __init__(self, namespace="mindease"):
+        ns = namespace
+        self._local = threading.local()
+        self._collectors = []
+        self.requests = Histogram(f"{ns}_http_request_duration_seconds",
+                                  "Request latency by route.", ("method", "route", "status"))
+        self.db_per_request = Histogram(f"{ns}_db_queries_per_request",
+                                        "DB statements executed per request.", ("route",), COUNT_BUCKETS)
+        self.db_seconds = Histogram(f"{ns}_db_query_duration_seconds",
+                                    "Latency of single DB statements.", ("route",))
+        self.stages = Histogram(f"{ns}_stage_duration_seconds",
+                                "Time spent in named stages (model inference, suggestion lookup, ...).",
+                                ("route", "stage"))
+        self.connections = Counter(f"{ns}_db_connections_opened_total",
+                                   "New database connections opened.")
+        self.profiles = Counter(f"{ns}_profiles_total", "Requests profiled.", ("route",))
+        self._metrics = [self.requests, self.db_per_request, self.db_seconds, self.stages,
+                         self.connections, self.profiles]
+
+    # --- request scope ---
+    def current(self):
+        return getattr(self._local, "stats", None)
+
+    def _route(self):
+        stats = self.current()
+        return stats.route if stats else "-"
+
+    def begin_request(self, route):
+        self._local.stats = RequestStats(route)
+
+    def end_request(self, method, status):
+        stats = self.current()
+        if stats is None:
+            return None
+        self._local.stats = None
+        self.requests.observe(time.perf_counter() - stats.started, method, stats.route, str(status))
+        self.db_per_request.observe(stats.db_calls, stats.route)
+        return stats
+
+    # --- recorders ---
+    def record_db(self, seconds):
+        stats = self.current()
+        if stats is not None:
+            stats.db_calls += 1
+            stats.db_seconds += seconds
+        self.db_seconds.observe(seconds, self._route())
+
+    def record_stage(self, stage, seconds):
+        self.stages.observe(seconds, self._route(), stage)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - started)
+
+    def count_connection(self, connect):
+        """Wrap a connect() factory so every new connection is counted."""
+        def wrapped():
+            conn = connect()
+            self.connections.inc()
+            return conn
+        return wrapped
+
+    def instrument_connection(self, conn):
+        return _TimedConnection(conn, self)
+
+    # --- exposition ---
+    def collect(self, prefix, fn):
+        self._collectors.append((prefix, fn))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, fn in self._collectors:
+            try:
+                data = fn()
+            except Exception as e:
+                print("⚠️ metrics collector error:", prefix, e)
+                continue
+            for key, value in sorted(data.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _TimedCursor:
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def _timed(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._metrics.record_db(time.perf_counter() - started)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cursor.executemany, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    """Connection proxy whose cursors time every execute()/executemany()."""
+
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs), self._metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -----------------------------
+# Sampling profiler (per request, opt-in)
+# -----------------------------
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a helper
+    thread and counts identical stacks. Costs nothing until started, and a
+    sample is just sys._current_frames(), so it can run on a live request.
+    collapsed() is the "frame;frame;frame count" format that flamegraph.pl
+    and speedscope read.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005, max_depth=64):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._stack(frame)] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+
+def profile_dir():
+    return os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "mindease_profiles"))
+
+
+def save_profile(profiler, route):
+    """Write the collapsed stacks of one request; returns the file name."""
+    path = profile_dir()
+    os.makedirs(path, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    name = "%s-%s-%s.collapsed" % (time.strftime("%Y%m%d-%H%M%S"), slug, uuid.uuid4().hex[:8])
+    with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    return name
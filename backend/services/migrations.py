@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# MySQL errors that mean "this statement already ran": a migration that died
+# half way (DDL auto-commits statement by statement) can simply be re-run.
+_ALREADY_APPLIED = {
+    1050,  # table already exists
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1091,  # can't DROP; check that column/key exists
+}
+
+_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Serialises migrate() across gunicorn workers that import the app together
+_LOCK_NAME = "mindease_migrations"
+
+
+class MigrationError(Exception):
+    pass
+
+
+def load_migrations(path=MIGRATIONS_DIR):
+    """[(version, name, sql)] for every NNNN_name.sql file, in version order."""
+    found = []
+    for filename in os.listdir(path):
+        m = _FILE_RE.match(filename)
+        if not m:
+            continue
+        with open(os.path.join(path, filename), encoding="utf-8") as f:
+            found.append((int(m.group(1)), m.group(2), f.read()))
+    found.sort()
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("duplicate migration version in %s" % path)
+    return found
+
+
+def split_statements(sql):
+    """Split a migration file on ';' after dropping -- comments."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+def _checksum(sql):
+    return hashlib.sha1(sql.encode("utf-8")).hexdigest()
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(40) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied(cursor):
+    """{version: (name, checksum)} already recorded in schema_migrations."""
+    _ensure_table(cursor)
+    cursor.execute("SELECT version, name, checksum FROM schema_migrations")
+    return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+
+def migrate(conn, path=MIGRATIONS_DIR, lock_timeout=60):
+    """
+    Apply every migration newer than the ones recorded in schema_migrations,
+    in order, and record each one as it finishes. Returns the versions applied.
+    An edited migration that was already applied is reported, not re-run.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (_LOCK_NAME, lock_timeout))
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        raise MigrationError("timed out waiting for the migration lock")
+    try:
+        done = applied(cursor)
+        ran = []
+        for version, name, sql in load_migrations(path):
+            if version in done:
+                if done[version][1] != _checksum(sql):
+                    print("⚠️ migration %04d_%s changed after it was applied" % (version, name))
+                continue
+            for statement in split_statements(sql):
+                try:
+                    cursor.execute(statement)
+                except Exception as e:
+                    if getattr(e, "errno", None) not in _ALREADY_APPLIED:
+                        raise MigrationError("%04d_%s failed: %s" % (version, name, e)) from e
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s,%s,%s)",
+                (version, name, _checksum(sql)))
+            conn.commit()
+            ran.append(version)
+            print("✅ applied migration %04d_%s" % (version, name))
+        return ran
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
+
+
+def status(conn, path=MIGRATIONS_DIR):
+    cursor = conn.cursor()
+    try:
+        done = applied(cursor)
+    finally:
+        cursor.close()
+    return [{
+        "version": version,
+        "name": name,
+        "applied": version in done,
+        "modified": version in done and done[version][1] != _checksum(sql),
+    } for version, name, sql in load_migrations(path)]
+
+
+# -----------------------------
+# EXPLAIN check for the hot queries
+# -----------------------------
+# name -> (query, sample params). Keep in step with the routes they come from.
+HOT_QUERIES = {
+    "history": (
+        "SELECT id, user_id, message AS text, sentiment_score AS score, created_at "
+        "FROM chat_logs ORDER BY id DESC LIMIT 200", ()),
+    "history_by_user": (
+        "SELECT id, message AS text, created_at FROM chat_logs WHERE user_id=%s AND id < %s "
+        "ORDER BY id DESC LIMIT 200", (1, 1000000)),
+    "questionnaire_history": (
+        "SELECT id, created_at AS timestamp, stress_score AS stress FROM questionnaire_responses "
+        "WHERE user_id=%s ORDER BY id DESC LIMIT 365", (1,)),
+    "questionnaire_history_since": (
+        "SELECT id, created_at AS timestamp, stress_score AS stress FROM questionnaire_responses "
+        "WHERE user_id=%s AND id > %s ORDER BY id ASC LIMIT 365", (1, 0)),
+    "admin_metrics_recent": (
+        "SELECT created_at, stress_score, anxiety_score, depression_score FROM questionnaire_responses "
+        "ORDER BY created_at DESC LIMIT 30", ()),
+    "peer_messages_page": (
+        "SELECT id, user_id, text, created_at FROM peer_messages WHERE id < %s ORDER BY id DESC LIMIT %s",
+        (1000000, 50)),
+    "peer_replies_for_page": (
+        "SELECT id, message_id, text, user_id FROM peer_replies WHERE message_id IN (%s,%s) ORDER BY id",
+        (1, 2)),
+    "peer_reaction_counts": (
+        "SELECT message_id, emoji, count FROM peer_reaction_counts "
+        "WHERE message_id IN (%s,%s) AND count > 0", (1, 2)),
+    "peer_mood_seed": (
+        "SELECT FLOOR(UNIX_TIMESTAMP(created_at) / 10) AS bucket, mood, COUNT(*) FROM peer_mood "
+        "WHERE created_at >= NOW() - INTERVAL 1 DAY GROUP BY bucket, mood", ()),
+}
+
+
+def explain(conn, queries=None):
+    """
+    EXPLAIN every hot query. A query passes when no table in its plan is read
+    with a full scan (type ALL) and each one uses an index. Plans depend on
+    table statistics, so run this against a database with realistic data.
+    """
+    cursor = conn.cursor(dictionary=True)
+    report = {}
+    try:
+        for name, (sql, params) in (queries or HOT_QUERIES).items():
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = cursor.fetchall()
+            ok = all(row.get("type") != "ALL" and row.get("key") for row in plan if row.get("table"))
+            report[name] = {
+                "ok": ok,
+                "filesort": any("filesort" in (row.get("Extra") or "") for row in plan),
+                "plan": [{k: row.get(k) for k in ("table", "type", "key", "rows", "Extra")} for row in plan],
+            }
+    finally:
+        cursor.close()
+    return report
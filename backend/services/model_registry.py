@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+
+
+class ModelRegistry:
+    """
+    Named, lazily-loaded models. Nothing is loaded at import time: the first
+    get() pays for the load, or warm_up() can be called up front (e.g. in the
+    gunicorn master with preload_app so forked workers share the pages).
+    A loader that raises is remembered and get() returns None afterwards.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._status = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name):
+        return name in self._status
+
+    def get(self, name):
+        if name in self._status:
+            return self._models.get(name)
+        with self._locks[name]:
+            if name not in self._status:
+                self._load(name)
+        return self._models.get(name)
+
+    def _load(self, name):
+        started = time.perf_counter()
+        try:
+            self._models[name] = self._loaders[name]()
+            error = None
+        except Exception as e:
+            print(f"⚠️ {name} model not available:", e)
+            self._models[name] = None
+            error = str(e)
+        self._status[name] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "error": error,
+            "pid": os.getpid(),
+        }
+
+    def warm_up(self, names=None):
+        for name in names or list(self._loaders):
+            if name in self._loaders:
+                self.get(name)
+        return self.report()
+
+    def report(self):
+        data = {}
+        for name in self._loaders:
+            status = self._status.get(name)
+            if status:
+                data[name] = dict(status, loaded=status["error"] is None,
+                                  available=self._models.get(name) is not None)
+            else:
+                data[name] = {"loaded": False, "available": None}
+        return data
+
+
+MODELS = ModelRegistry()
@@ -0,0 +1,171 @@
+import glob
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+def resident_bytes():
+    """Current RSS of this process (Linux /proc), or None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelVersion:
+    def __init__(self, name, path, mtime, model, load_seconds, rss_delta):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.model = model
+        self.load_seconds = load_seconds
+        self.rss_delta = rss_delta
+        self.loaded_at = time.time()
+
+    @property
+    def key(self):
+        return (self.path, self.mtime)
+
+    def describe(self):
+        return {
+            "version": self.name,
+            "path": self.path,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else None,
+            "load_seconds": round(self.load_seconds, 4),
+            "rss_delta_bytes": self.rss_delta,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelStore:
+    """
+    Versioned joblib artifacts with hot swap.
+
+    The newest file in <root>/versions/*.joblib is the current version (the
+    legacy <root>/<default_name> is used when there are none). Models are
+    loaded with joblib's mmap_mode, so the NumPy arrays of an uncompressed
+    dump stay file-backed and every worker maps the same page-cache pages
+    instead of holding a private copy.
+
+    current() checks for a newer file at most every check_interval seconds.
+    One caller loads it while everyone else keeps using the old version; the
+    swap is a single reference assignment, and callers that already hold a
+    ModelVersion (e.g. a running predict_batch) finish on it.
+    """
+
+    def __init__(self, root, default_name="trained_model.joblib", check_interval=5.0,
+                 mmap_mode="r", history=5):
+        self.root = root
+        self.default_name = default_name
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self._current = None
+        self._checked = float("-inf")
+        self._loading = threading.Lock()
+        self._history = []
+        self._history_size = history
+        self.swaps = 0
+        self.load_errors = 0
+
+    @property
+    def versions_dir(self):
+        return os.path.join(self.root, "versions")
+
+    def latest_path(self):
+        candidates = glob.glob(os.path.join(self.versions_dir, "*.joblib"))
+        if candidates:
+            return max(candidates, key=lambda p: (os.path.getmtime(p), p))
+        legacy = os.path.join(self.root, self.default_name)
+        return legacy if os.path.exists(legacy) else None
+
+    def _load(self, path):
+        import joblib
+
+        before = resident_bytes()
+        started = time.perf_counter()
+        model = joblib.load(path, mmap_mode=self.mmap_mode)
+        elapsed = time.perf_counter() - started
+        after = resident_bytes()
+        name = os.path.splitext(os.path.basename(path))[0]
+        return ModelVersion(name, path, os.path.getmtime(path), model, elapsed,
+                            after - before if before is not None and after is not None else None)
+
+    def refresh(self, block=True):
+        """Load the latest artifact if it differs from the current one. Returns the current version."""
+        if not self._loading.acquire(blocking=block):
+            return self._current  # someone else is loading; keep serving the old version
+        try:
+            self._checked = time.monotonic()
+            path = self.latest_path()
+            if path is None:
+                return self._current
+            current = self._current
+            if current is not None and current.key == (path, os.path.getmtime(path)):
+                return current
+            try:
+                version = self._load(path)
+            except ImportError:
+                return current  # joblib not installed: rule-based fallback
+            except Exception as e:
+                self.load_errors += 1
+                print("⚠️ model load failed, keeping current version:", path, e)
+                return current
+            self._current = version
+            if current is not None:
+                self.swaps += 1
+                print(f"✅ risk model swapped: {current.name} -> {version.name}")
+            self._history = ([version.describe()] + self._history)[:self._history_size]
+            return version
+        finally:
+            self._loading.release()
+
+    def current(self):
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.refresh(block=self._current is None)
+        return self._current
+
+    def model(self):
+        version = self.current()
+        return version.model if version is not None else None
+
+    def publish(self, src, name=None):
+        """
+        Install src as a new version. Copied next to its destination and
+        renamed into place, so a watcher never sees a half-written file.
+        """
+        os.makedirs(self.versions_dir, exist_ok=True)
+        name = name or time.strftime("%Y%m%d-%H%M%S")
+        dest = os.path.join(self.versions_dir, name + ".joblib")
+        fd, tmp = tempfile.mkstemp(dir=self.versions_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        except Exception:
+            os.remove(tmp)
+            raise
+        return dest
+
+    def stats(self):
+        current = self._current
+        return {
+            "current": current.describe() if current else None,
+            "history": list(self._history),
+            "swaps": self.swaps,
+            "load_errors": self.load_errors,
+            "mmap_mode": self.mmap_mode,
+            "rss_bytes": resident_bytes(),
+            "pid": os.getpid(),
+        }
+
+
+def model_store_from_env(root):
+    return ModelStore(
+        root,
+        check_interval=float(os.getenv("MODEL_STORE_CHECK_SECONDS", "5")),
+        # "" disables memory-mapping (e.g. for compressed dumps, which can't be mapped anyway)
+        mmap_mode=os.getenv("MODEL_STORE_MMAP_MODE", "r") or None,
+    )
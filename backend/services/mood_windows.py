@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import Counter
+
+from backend.services import peer_events
+
+WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+RESOLUTION = 10  # seconds per bucket; windows slide in steps of this size
+
+
+class SlidingCounts:
+    """
+    Per-mood counts over several trailing windows. Events land in
+    fixed-width time buckets and every window keeps a running total; as
+    time moves on, buckets leaving a window are subtracted from it once.
+    add() and totals() cost O(windows) however many events are counted.
+    """
+
+    def __init__(self, windows=WINDOWS, resolution=RESOLUTION):
+        self.windows = dict(windows)
+        self.resolution = resolution
+        self.span = max(self.windows.values()) // resolution
+        self.clear()
+
+    def clear(self):
+        self._buckets = {}  # bucket index -> Counter
+        self._totals = {name: Counter() for name in self.windows}
+        self._now = None
+
+    def _lo(self, name, now):
+        # oldest bucket still inside window `name`
+        return now - self.windows[name] // self.resolution + 1
+
+    def advance(self, ts):
+        now = int(ts // self.resolution)
+        if self._now is not None and now <= self._now:
+            return
+        for name, total in self._totals.items():
+            if self._now is None:
+                continue
+            old_lo, new_lo = self._lo(name, self._now), self._lo(name, now)
+            if new_lo - old_lo >= self.windows[name] // self.resolution:
+                total.clear()  # idle for longer than the window
+                continue
+            for i in range(old_lo, new_lo):
+                bucket = self._buckets.get(i)
+                if bucket:
+                    total.subtract(bucket)
+            for mood in [m for m, n in total.items() if n <= 0]:
+                del total[mood]
+        if self._now is None or now - self._now >= self.span:
+            self._buckets = {i: b for i, b in self._buckets.items() if i > now - self.span}
+        else:
+            for i in range(self._now - self.span + 1, now - self.span + 1):
+                self._buckets.pop(i, None)
+        self._now = now
+
+    def add(self, mood, ts, n=1):
+        self.advance(ts)
+        # a slightly late event from another worker counts in the current bucket
+        idx = min(int(ts // self.resolution), self._now)
+        self.add_bucket(mood, idx, n)
+
+    def add_bucket(self, mood, idx, n=1):
+        """Count n events in bucket idx (an already-advanced clock is assumed)."""
+        if self._now is None or idx < self._now - self.span + 1:
+            return
+        self._buckets.setdefault(idx, Counter())[mood] += n
+        for name, total in self._totals.items():
+            if idx >= self._lo(name, self._now):
+                total[mood] += n
+
+    def totals(self):
+        return {
+            name: {"total": sum(total.values()), "moods": dict(total), "seconds": self.windows[name]}
+            for name, total in self._totals.items()
+        }
+
+
+class MoodWindows:
+    """
+    Community mood over the last 5 minutes / hour / day, kept in memory in
+    every worker. Seeded from peer_mood with one aggregate query; after that
+    each worker folds in the "mood" events all workers append to the shared
+    peer event log (read_since from its last version), so the counts agree
+    across workers without touching MySQL. A rotated log triggers a reseed.
+    """
+
+    def __init__(self, windows=WINDOWS, resolution=RESOLUTION):
+        self.counts = SlidingCounts(windows, resolution)
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()  # one seed query at a time per process
+        self._version = None
+        self._max_seeded_id = 0
+        self.reseeds = 0
+        self.events_applied = 0
+
+    @property
+    def seeded(self):
+        return self._version is not None
+
+    def seed(self, conn):
+        """Load the last day of peer_mood into fresh counters."""
+        span = max(self.counts.windows.values())
+        res = self.counts.resolution
+        # taken first: events after it are tailed, older rows come from the query
+        version = peer_events.current_version()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0), UNIX_TIMESTAMP() FROM peer_mood")
+            max_id, db_now = cursor.fetchone()
+            cursor.execute(
+                "SELECT FLOOR(UNIX_TIMESTAMP(created_at) / %s) AS bucket, mood, COUNT(*) FROM peer_mood "
+                "WHERE created_at >= FROM_UNIXTIME(%s) AND id <= %s AND mood IS NOT NULL "
+                "GROUP BY bucket, mood",
+                (res, int(db_now) - span, max_id))
+            rows = cursor.fetchall()
+            conn.commit()
+        finally:
+            cursor.close()
+        with self._lock:
+            self.counts.clear()
+            self.counts.advance(time.time())
+            for bucket, mood, n in rows:
+                self.counts.add_bucket(mood, int(bucket), int(n))
+            self._max_seeded_id = int(max_id)
+            self._version = version
+            self.reseeds += 1
+
+    def _apply_events(self):
+        new_version, events = peer_events.read_since(self._version)
+        if new_version is None:
+            return False
+        for event in events:
+            if event.get("type") == "mood" and event.get("id", 0) > self._max_seeded_id:
+                self.counts.add(event["mood"], event.get("ts") or time.time())
+                self.events_applied += 1
+        self._version = new_version
+        return True
+
+    def summary(self, connect):
+        """
+        Current window totals. connect() is only called to (re)seed: on
+        first use in a process and after the event log was rotated.
+        Concurrent callers that find the counts unseeded wait for one seed.
+        """
+        with self._lock:
+            ok = self.seeded and self._apply_events()
+            if ok:
+                self.counts.advance(time.time())
+                return self.counts.totals()
+        with self._seed_lock:
+            with self._lock:
+                # another thread may have seeded while we waited
+                ok = self.seeded and self._apply_events()
+            if not ok:
+                conn = connect()
+                try:
+                    self.seed(conn)
+                finally:
+                    conn.close()
+        with self._lock:
+            self._apply_events()
+            self.counts.advance(time.time())
+            return self.counts.totals()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "buckets": len(self.counts._buckets),
+                "reseeds": self.reseeds,
+                "events_applied": self.events_applied,
+                "max_seeded_id": self._max_seeded_id,
+            }
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+_COUNTERS = {"hash": "hashes", "verify": "verifies"}
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class HasherTimeout(Exception):
+    pass
+
+
+def scheme_of(stored_hash):
+    """'scrypt:32768:8:1' / 'pbkdf2:sha256:600000' part of a werkzeug hash."""
+    return (stored_hash or "").split("$", 1)[0]
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug password hashing/verification on a small thread pool so a
+    login burst can't occupy every request thread. hashlib's scrypt and
+    pbkdf2_hmac release the GIL, so `workers` caps how many cores hashing
+    may use; at most `max_pending` more calls wait for a thread and anything
+    beyond that fails fast with HasherBusy. Callers block on the result, so
+    workers + max_pending must stay well below the request thread count (see
+    hasher_from_env). A call not done within `timeout` raises HasherTimeout.
+
+    method is any werkzeug method string (e.g. "scrypt:65536:8:1",
+    "pbkdf2:sha256:600000"). Hashes stored with different parameters are
+    reported by needs_rehash() so login can upgrade them.
+    """
+
+    def __init__(self, method="scrypt", workers=2, max_pending=2, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._scheme = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._recent = {"hash": deque(maxlen=512), "verify": deque(maxlen=512)}
+        self._metrics = {
+            "hashes": 0,
+            "verifies": 0,
+            "rehashes": 0,
+            "rejected_busy": 0,
+            "timeouts": 0,
+            "hash_seconds_total": 0.0,
+            "verify_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+            "verify_seconds_max": 0.0,
+        }
+
+    @property
+    def scheme(self):
+        # canonical form of method, with werkzeug's defaults filled in (costs one hash, so lazy)
+        if self._scheme is None:
+            self._scheme = scheme_of(generate_password_hash("", self.method))
+        return self._scheme
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # threads don't survive fork: fresh pool and slots in every worker
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+            self._pid = os.getpid()
+
+    def _timed(self, kind, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                m = self._metrics
+                m[_COUNTERS[kind]] += 1
+                m[kind + "_seconds_total"] += elapsed
+                m[kind + "_seconds_max"] = max(m[kind + "_seconds_max"], elapsed)
+                self._recent[kind].append(elapsed)
+
+    def _submit(self, kind, fn, *args):
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics["rejected_busy"] += 1
+            raise HasherBusy("password hashing is at capacity, retry shortly")
+        try:
+            future = self._executor.submit(self._timed, kind, fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _result(self, future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise HasherTimeout("password hashing timed out, retry shortly")
+
+    def hash(self, password):
+        return self._result(self._submit("hash", generate_password_hash, password, self.method))
+
+    def verify(self, stored_hash, password):
+        return self._result(self._submit("verify", check_password_hash, stored_hash, password))
+
+    def needs_rehash(self, stored_hash):
+        return scheme_of(stored_hash) != self.scheme
+
+    def rehash_later(self, password, save):
+        """
+        Hash password with the current parameters off the request path and
+        hand the result to save(new_hash). Skipped silently when busy: the
+        next login will try again.
+        """
+        def done(future):
+            try:
+                save(future.result())
+                with self._lock:
+                    self._metrics["rehashes"] += 1
+            except Exception as e:
+                print("⚠️ password rehash failed:", e)
+
+        try:
+            self._submit("hash", generate_password_hash, password, self.method).add_done_callback(done)
+        except HasherBusy:
+            pass
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._metrics)
+            recent = {k: sorted(v) for k, v in self._recent.items()}
+        for kind, values in recent.items():
+            if values:
+                data[kind + "_seconds_p50"] = values[len(values) // 2]
+                data[kind + "_seconds_p95"] = values[min(len(values) - 1, int(len(values) * 0.95))]
+        data["scheme"] = self.scheme
+        data["workers"] = self.workers
+        data["max_pending"] = self.max_pending
+        return data
+
+
+def hasher_from_env():
+    workers = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    # every hashing call parks a request thread; leave at least half of them
+    # (GUNICORN_THREADS, as in gunicorn.conf.py) free for other endpoints
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+    default_pending = max(0, threads // 2 - workers)
+    return PasswordHasher(
+        method=os.getenv("PASSWORD_HASH_METHOD", "scrypt"),
+        workers=workers,
+        max_pending=int(os.getenv("PASSWORD_HASH_QUEUE", str(default_pending))),
+        timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),
+    )
@@ -0,0 +1,187 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+# Local stand-in for a message broker: an append-only JSON-lines log that every
+# gunicorn worker on the host can append to and tail. A version is
+# "<inode>:<byte offset>", so "everything after version N" is a single seek,
+# and a rotated log (new inode) is detected instead of misread.
+# The log holds peer message text and moods: it lives in an app-owned
+# directory (not shared /tmp), is created 0600, never through a symlink, and
+# a file owned by another user is refused.
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LOG_PATH = os.getenv("PEER_EVENTS_PATH", os.path.join(_ROOT, "data", "run", "peer_events.log"))
+MAX_BYTES = int(os.getenv("PEER_EVENTS_MAX_BYTES", str(4 * 1024 * 1024)))
+POLL_INTERVAL = float(os.getenv("PEER_EVENTS_POLL_INTERVAL", "0.5"))
+
+
+def _stat():
+    try:
+        st = os.stat(LOG_PATH)
+        return st.st_ino, st.st_size
+    except OSError:
+        return 0, 0
+
+
+def _format(ino, offset):
+    return f"{ino}:{offset}"
+
+
+def parse_version(value):
+    try:
+        ino, offset = str(value).split(":", 1)
+        return int(ino), int(offset)
+    except (TypeError, ValueError):
+        return None
+
+
+def _open(mode):
+    """Open LOG_PATH ("ab" or "rb") without following symlinks; must be ours and private."""
+    flags = os.O_NOFOLLOW | (os.O_WRONLY | os.O_APPEND | os.O_CREAT if mode == "ab" else os.O_RDONLY)
+    fd = os.open(LOG_PATH, flags, 0o600)
+    try:
+        st = os.fstat(fd)
+        if st.st_uid != os.getuid():
+            raise PermissionError("peer event log %s is not owned by this user" % LOG_PATH)
+        if st.st_mode & 0o077:
+            os.fchmod(fd, 0o600)
+        return os.fdopen(fd, mode)
+    except Exception:
+        os.close(fd)
+        raise
+
+
+def ensure_log():
+    os.makedirs(os.path.dirname(LOG_PATH), mode=0o700, exist_ok=True)
+    _open("ab").close()
+
+
+def current_version():
+    return _format(*_stat())
+
+
+def _open_locked():
+    while True:
+        f = _open("ab")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        # another writer may have rotated the file while we waited for the lock
+        try:
+            same = os.fstat(f.fileno()).st_ino == os.stat(LOG_PATH).st_ino
+        except OSError:
+            same = False
+        if same:
+            return f
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def publish(event_type, **payload):
+    """
+    Append one event to the shared log and return the new version.
+    The log is rotated once it outgrows MAX_BYTES; tailing readers get a reset.
+    """
+    line = (json.dumps(dict(payload, type=event_type, ts=time.time()), ensure_ascii=False) + "\n").encode("utf-8")
+    f = _open_locked()
+    try:
+        if f.tell() > MAX_BYTES:
+            os.replace(LOG_PATH, LOG_PATH + ".1")
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+            f = _open_locked()
+        f.write(line)
+        f.flush()
+        return _format(os.fstat(f.fileno()).st_ino, f.tell())
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def read_since(version):
+    """
+    Events appended after `version` as (new_version, [event, ...]).
+    new_version is None when the client's version no longer applies (log rotated).
+    """
+    parsed = parse_version(version)
+    ino, size = _stat()
+    if parsed is None or parsed[0] != ino or parsed[1] > size:
+        return None, []
+    offset = parsed[1]
+    if offset == size:
+        return version, []
+    with _open("rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    # only hand out complete lines; a partially written tail is picked up next time
+    end = data.rfind(b"\n") + 1
+    events = [json.loads(l) for l in data[:end].decode("utf-8").splitlines() if l]
+    return _format(ino, offset + end), events
+
+
+def wait_for_events(version, timeout):
+    """
+    Block up to `timeout` seconds until something newer than `version` exists.
+    Costs one stat() per poll interval and no database access.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        new_version, events = read_since(version)
+        if new_version is None or events or time.monotonic() >= deadline:
+            return new_version, events
+        time.sleep(POLL_INTERVAL)
+
+
+class StreamSlots:
+    """
+    Caps how many request threads a worker lets streams / long-polls hold.
+    Under gthread every open peer tab pins a thread for up to `lifetime`
+    seconds, so without a cap a handful of idle tabs would starve every other
+    endpoint. Past the cap callers get a plain poll instead.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._used = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._used >= self.limit:
+                self.rejected += 1
+                return False
+            self._used += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._used -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "in_use": self._used, "rejected": self.rejected}
+
+
+def sse_stream(version, lifetime=25.0, heartbeat=15.0):
+    """
+    Server-Sent Events generator. Ends after `lifetime` so a worker isn't
+    pinned forever; EventSource reconnects with Last-Event-ID and resumes.
+    """
+    yield "retry: 1000\n\n"
+    deadline = time.monotonic() + lifetime
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        new_version, events = wait_for_events(version, min(heartbeat, max(0.0, deadline - time.monotonic())))
+        if new_version is None:
+            version = current_version()
+            yield f"id: {version}\nevent: reset\ndata: {{}}\n\n"
+            last_sent = time.monotonic()
+            continue
+        if events:
+            version = new_version
+            yield f"id: {version}\nevent: delta\ndata: {json.dumps(events, ensure_ascii=False)}\n\n"
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
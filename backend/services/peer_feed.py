@@ -0,0 +1,90 @@
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _placeholders(ids):
+    return ",".join(["%s"] * len(ids))
+
+
+def fetch_messages(cursor, limit=DEFAULT_LIMIT, before=None, after=None):
+    """
+    Keyset page of peer_messages, newest first.
+    before=<id> pages back in time, after=<id> returns only newer posts.
+    """
+    if after is not None:
+        cursor.execute(
+            "SELECT id, user_id, text, created_at FROM peer_messages WHERE id > %s ORDER BY id ASC LIMIT %s",
+            (after, limit)
+        )
+        return list(reversed(cursor.fetchall()))
+    if before is not None:
+        cursor.execute(
+            "SELECT id, user_id, text, created_at FROM peer_messages WHERE id < %s ORDER BY id DESC LIMIT %s",
+            (before, limit)
+        )
+    else:
+        cursor.execute(
+            "SELECT id, user_id, text, created_at FROM peer_messages ORDER BY id DESC LIMIT %s",
+            (limit,)
+        )
+    return cursor.fetchall()
+
+
+def fetch_replies(cursor, message_ids):
+    replies = {mid: [] for mid in message_ids}
+    if not message_ids:
+        return replies
+    cursor.execute(
+        f"SELECT id, message_id, text, user_id FROM peer_replies WHERE message_id IN ({_placeholders(message_ids)}) ORDER BY id",
+        tuple(message_ids)
+    )
+    for r in cursor.fetchall():
+        replies[r["message_id"]].append(serialize_reply(r))
+    return replies
+
+
+def fetch_reactions(cursor, message_ids):
+    reactions = {mid: {} for mid in message_ids}
+    if not message_ids:
+        return reactions
+    # denormalized counters (see reactions.react), not a GROUP BY over every reaction
+    cursor.execute(
+        f"""SELECT message_id, emoji, count FROM peer_reaction_counts
+            WHERE message_id IN ({_placeholders(message_ids)}) AND count > 0""",
+        tuple(message_ids)
+    )
+    for r in cursor.fetchall():
+        reactions[r["message_id"]][r["emoji"]] = r["count"]
+    return reactions
+
+
+def serialize_reply(r):
+    return {"id": r["id"], "text": r["text"], "user": f"Peer#{r['user_id']}"}
+
+
+def serialize_message(m, replies, reactions):
+    return {
+        "id": m["id"],
+        "user": f"Peer#{m['user_id']}",  # pseudo anonymous user
+        "text": m["text"],
+        "replies": replies,
+        "reactions": reactions,
+        "badge": "🌟 Supportive" if len(replies) > 3 else None
+    }
+
+
+def build_feed(conn, limit=DEFAULT_LIMIT, before=None, after=None):
+    """
+    Messages, replies and reaction counts in three set-based queries
+    (instead of 1 + 2N), stitched together in memory.
+    """
+    limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+    cursor = conn.cursor(dictionary=True)
+    try:
+        msgs = fetch_messages(cursor, limit, before, after)
+        ids = [m["id"] for m in msgs]
+        replies = fetch_replies(cursor, ids)
+        reactions = fetch_reactions(cursor, ids)
+    finally:
+        cursor.close()
+    return [serialize_message(m, replies[m["id"]], reactions[m["id"]]) for m in msgs]
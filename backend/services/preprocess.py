@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Collects named stage durations for one request (seconds)."""
+
+    def __init__(self):
+        self.stages = OrderedDict()
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def server_timing(self):
+        # Server-Timing header value, visible in the browser devtools
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+
+class FramePreprocessor:
+    """
+    Runs in front of the emotion model:
+      1. downscale frames wider than target_width
+      2. reuse the last face box seen for the same client, so consecutive
+         frames skip face detection and send only the face crop
+    A box is trusted for box_ttl seconds and at most max_reuse frames before
+    detection runs again.
+    """
+
+    def __init__(self, target_width=320, box_ttl=2.0, max_reuse=10, margin=0.15, max_clients=1024):
+        self.target_width = target_width
+        self.box_ttl = box_ttl
+        self.max_reuse = max_reuse
+        self.margin = margin
+        self.max_clients = max_clients
+        self._boxes = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"frames": 0, "downscaled": 0, "box_hits": 0, "box_misses": 0, "stage_seconds_total": {}}
+
+    def downscale(self, frame):
+        h, w = frame.shape[:2]
+        if not self.target_width or w <= self.target_width:
+            return frame
+        import cv2
+        scale = self.target_width / float(w)
+        with self._lock:
+            self._metrics["downscaled"] += 1
+        return cv2.resize(frame, (self.target_width, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+
+    def _cached_box(self, client_key, shape):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._boxes.get(client_key)
+            if not entry or entry["shape"] != shape or now - entry["at"] > self.box_ttl or entry["uses"] >= self.max_reuse:
+                self._metrics["box_misses"] += 1
+                return None
+            entry["uses"] += 1
+            self._boxes.move_to_end(client_key)
+            self._metrics["box_hits"] += 1
+            return entry["box"]
+
+    def _crop(self, frame, box):
+        x, y, w, h = box
+        mx, my = int(w * self.margin), int(h * self.margin)
+        fh, fw = frame.shape[:2]
+        return frame[max(0, y - my):min(fh, y + h + my), max(0, x - mx):min(fw, x + w + mx)]
+
+    def prepare(self, frame, client_key, timer):
+        """
+        Returns (input_frame, frame_shape, detect) for the emotion service:
+        either the downscaled frame with detect=True, or a face crop with
+        detect=False. frame_shape is what remember() expects back.
+        """
+        with timer.stage("downscale"):
+            frame = self.downscale(frame)
+        with timer.stage("box_lookup"):
+            box = self._cached_box(client_key, frame.shape) if client_key else None
+        with self._lock:
+            self._metrics["frames"] += 1
+        if box is None:
+            return frame, frame.shape, True
+        return self._crop(frame, box), frame.shape, False
+
+    def remember(self, client_key, shape, region):
+        """Store the face box the detector found (ignores 'whole frame' results)."""
+        if not client_key or not region:
+            return
+        x, y, w, h = (int(region.get(k, 0)) for k in ("x", "y", "w", "h"))
+        if w <= 0 or h <= 0 or (w >= shape[1] * 0.95 and h >= shape[0] * 0.95):
+            return
+        with self._lock:
+            self._boxes[client_key] = {"box": (x, y, w, h), "shape": shape, "at": time.monotonic(), "uses": 0}
+            self._boxes.move_to_end(client_key)
+            while len(self._boxes) > self.max_clients:
+                self._boxes.popitem(last=False)
+
+    def record(self, timer):
+        with self._lock:
+            totals = self._metrics["stage_seconds_total"]
+            for name, seconds in timer.stages.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._metrics)
+            data["stage_seconds_total"] = dict(data["stage_seconds_total"])
+            data["cached_clients"] = len(self._boxes)
+        frames = data["frames"] or 1
+        data["stage_ms_avg"] = {k: round(v * 1000 / frames, 2) for k, v in data["stage_seconds_total"].items()}
+        data.update(target_width=self.target_width, box_ttl=self.box_ttl, max_reuse=self.max_reuse)
+        return data
+
+
+def preprocessor_from_env():
+    return FramePreprocessor(
+        target_width=int(os.getenv("EMOTION_TARGET_WIDTH", "320")),
+        box_ttl=float(os.getenv("EMOTION_BOX_TTL", "2.0")),
+        max_reuse=int(os.getenv("EMOTION_BOX_MAX_REUSE", "10")),
+        margin=float(os.getenv("EMOTION_BOX_MARGIN", "0.15")),
+    )
@@ -0,0 +1,80 @@
+# Per-(message, emoji) reaction counters. peer_reactions keeps the raw rows;
+# peer_reaction_counts (backend/migrations/0004_peer_reaction_counts.sql) is
+# the denormalized count the feed reads.
+
+RECONCILE_BATCH = 500
+
+
+def react(conn, message_id, user_id, emoji):
+    """
+    Record a reaction and bump its counter in one transaction. Returns the
+    new count. Not deduplicated per user until the peer routes identify
+    the reacting user.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO peer_reactions (message_id, user_id, emoji) VALUES (%s,%s,%s)",
+                       (message_id, user_id, emoji))
+        cursor.execute(
+            "INSERT INTO peer_reaction_counts (message_id, emoji, count) VALUES (%s,%s,1) "
+            "ON DUPLICATE KEY UPDATE count = count + 1",
+            (message_id, emoji))
+        cursor.execute("SELECT count FROM peer_reaction_counts WHERE message_id=%s AND emoji=%s",
+                       (message_id, emoji))
+        count = int(cursor.fetchone()[0])
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _reconcile_batch(conn, message_ids):
+    placeholders = ",".join(["%s"] * len(message_ids))
+    cursor = conn.cursor()
+    try:
+        # lock the counters first: a concurrent react() waits on them, and the
+        # raw count below then sees every reaction committed before this point
+        cursor.execute(f"SELECT message_id, emoji, count FROM peer_reaction_counts "
+                       f"WHERE message_id IN ({placeholders}) FOR UPDATE", tuple(message_ids))
+        stored = {(m, e): c for m, e, c in cursor.fetchall()}
+        cursor.execute(f"SELECT message_id, emoji, COUNT(*) FROM peer_reactions "
+                       f"WHERE message_id IN ({placeholders}) AND emoji IS NOT NULL "
+                       f"GROUP BY message_id, emoji", tuple(message_ids))
+        actual = {(m, e): c for m, e, c in cursor.fetchall()}
+        fixes = [(m, e, actual.get((m, e), 0)) for (m, e) in set(stored) | set(actual)
+                 if stored.get((m, e)) != actual.get((m, e), 0)]
+        if fixes:
+            cursor.executemany(
+                "INSERT INTO peer_reaction_counts (message_id, emoji, count) VALUES (%s,%s,%s) "
+                "ON DUPLICATE KEY UPDATE count = VALUES(count)", fixes)
+        conn.commit()
+        return fixes
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def reconcile(conn, batch_size=RECONCILE_BATCH):
+    """
+    Rebuild the counters from peer_reactions, a batch of messages per
+    transaction so reactions keep flowing meanwhile. Returns
+    (messages checked, [(message_id, emoji, corrected count)]).
+    """
+    checked, fixes, last_id = 0, [], 0
+    while True:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM peer_messages WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+        if not ids:
+            return checked, fixes
+        fixes.extend(_reconcile_batch(conn, ids))
+        checked += len(ids)
+        last_id = ids[-1]
@@ -0,0 +1,96 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+
+# Filters served by /api/resources; every combination is serialized up front
+INDEXED_FIELDS = ("language", "type")
+
+
+def _key(value):
+    return (value or "").strip().lower() or None
+
+
+class ResourceSnapshot:
+    """
+    One load of data/resources.json: items in file order, an index per
+    INDEXED_FIELDS value, and the serialized body + ETag for every
+    (language, type) combination, including "any" for either.
+    """
+
+    def __init__(self, items, version=""):
+        self.items = items
+        self.version = version
+        self.indexes = {field: {} for field in INDEXED_FIELDS}
+        self.labels = {field: {} for field in INDEXED_FIELDS}  # key -> spelling as first seen
+        for i, item in enumerate(items):
+            for field in INDEXED_FIELDS:
+                key = _key(item.get(field))
+                self.indexes[field].setdefault(key, []).append(i)
+                self.labels[field].setdefault(key, item.get(field))
+        choices = [[None] + sorted(k for k in self.indexes[f] if k) for f in INDEXED_FIELDS]
+        self.responses = {}
+        for combo in itertools.product(*choices):
+            body = json.dumps([items[i] for i in self._select(combo)], ensure_ascii=False).encode("utf-8")
+            self.responses[combo] = (body, '"%s"' % hashlib.sha1(body).hexdigest()[:16])
+
+    def _select(self, combo):
+        rows = None
+        for field, value in zip(INDEXED_FIELDS, combo):
+            if value is None:
+                continue
+            found = set(self.indexes[field].get(value, ()))
+            rows = found if rows is None else rows & found
+        return sorted(rows) if rows is not None else range(len(self.items))
+
+    def response(self, **filters):
+        """(body, etag) for the given filters; unknown values give an empty list."""
+        combo = tuple(_key(filters.get(field)) for field in INDEXED_FIELDS)
+        return self.responses.get(combo) or (b"[]", '"empty"')
+
+    def facets(self):
+        return {field: [self.labels[field][k] for k in sorted(k for k in self.indexes[field] if k)]
+                for field in INDEXED_FIELDS}
+
+
+class ResourceCatalog:
+    """
+    Loads the resource list from a JSON file and rebuilds the snapshot when
+    the file's mtime changes (checked at most every check_interval seconds).
+    A broken edit is reported and the previous snapshot stays in effect.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._snapshot = self._load()
+        self._checked = time.monotonic()
+        self.reloads = 0
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            return ResourceSnapshot(json.load(f), version=str(self._mtime))
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    self._maybe_reload()
+        return self._snapshot
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            self._snapshot = self._load()
+            self.reloads += 1
+        except Exception as e:
+            print("⚠️ resources reload failed, keeping previous catalog:", e)
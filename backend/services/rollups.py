@@ -0,0 +1,141 @@
+import datetime
+
+# Running sums/counts for questionnaire_responses, maintained in the same
+# transaction as the inserts (see WriteBehindBuffer hooks). Tables are created
+# by backend/migrations/0002_questionnaire_rollups.sql:
+#   questionnaire_rollup_total       one row, whole table
+#   questionnaire_rollup_hourly      per hour; day/week series are summed from it
+#   questionnaire_rollup_user_daily  per user per day
+
+_UPSERT = """ON DUPLICATE KEY UPDATE n = n + VALUES(n),
+    sum_stress = sum_stress + VALUES(sum_stress),
+    sum_anxiety = sum_anxiety + VALUES(sum_anxiety),
+    sum_depression = sum_depression + VALUES(sum_depression)"""
+
+BUCKETS = {
+    "hour": "bucket_start",
+    "day": "DATE(bucket_start)",
+    "week": "DATE_SUB(DATE(bucket_start), INTERVAL WEEKDAY(bucket_start) DAY)",
+}
+
+
+def _add(acc, key, stress, anxiety, depression):
+    a = acc.setdefault(key, [0, 0.0, 0.0, 0.0])
+    a[0] += 1
+    a[1] += stress or 0.0
+    a[2] += anxiety or 0.0
+    a[3] += depression or 0.0
+
+
+def apply_questionnaire_rows(cursor, rows):
+    """
+    Fold newly inserted questionnaire rows into the rollups. rows are the
+    write-behind tuples: (user_id, stress, anxiety, depression, social,
+    parental, created_at). Aggregated in memory first, so a flush of N rows
+    costs at most three upsert statements.
+    """
+    total, hourly, user_daily = {}, {}, {}
+    for user_id, stress, anxiety, depression, _social, _parental, created_at in rows:
+        created_at = created_at or datetime.datetime.now()
+        _add(total, 1, stress, anxiety, depression)
+        _add(hourly, created_at.replace(minute=0, second=0, microsecond=0), stress, anxiety, depression)
+        _add(user_daily, (user_id, created_at.date()), stress, anxiety, depression)
+
+    cursor.executemany(
+        "INSERT INTO questionnaire_rollup_total (id, n, sum_stress, sum_anxiety, sum_depression) "
+        "VALUES (%s,%s,%s,%s,%s) " + _UPSERT,
+        [(k, *v) for k, v in total.items()])
+    cursor.executemany(
+        "INSERT INTO questionnaire_rollup_hourly (bucket_start, n, sum_stress, sum_anxiety, sum_depression) "
+        "VALUES (%s,%s,%s,%s,%s) " + _UPSERT,
+        [(k, *v) for k, v in hourly.items()])
+    cursor.executemany(
+        "INSERT INTO questionnaire_rollup_user_daily (user_id, day, n, sum_stress, sum_anxiety, sum_depression) "
+        "VALUES (%s,%s,%s,%s,%s,%s) " + _UPSERT,
+        [(uid, day, *v) for (uid, day), v in user_daily.items()])
+
+
+def backfill(conn):
+    """Rebuild every rollup from questionnaire_responses in one transaction."""
+    cursor = conn.cursor()
+    try:
+        for table in ("questionnaire_rollup_total", "questionnaire_rollup_hourly", "questionnaire_rollup_user_daily"):
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute("""
+            INSERT INTO questionnaire_rollup_total (id, n, sum_stress, sum_anxiety, sum_depression)
+            SELECT 1, COUNT(*), COALESCE(SUM(stress_score), 0), COALESCE(SUM(anxiety_score), 0),
+                   COALESCE(SUM(depression_score), 0)
+            FROM questionnaire_responses
+        """)
+        cursor.execute("""
+            INSERT INTO questionnaire_rollup_hourly (bucket_start, n, sum_stress, sum_anxiety, sum_depression)
+            SELECT DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00'), COUNT(*), COALESCE(SUM(stress_score), 0),
+                   COALESCE(SUM(anxiety_score), 0), COALESCE(SUM(depression_score), 0)
+            FROM questionnaire_responses GROUP BY 1
+        """)
+        cursor.execute("""
+            INSERT INTO questionnaire_rollup_user_daily (user_id, day, n, sum_stress, sum_anxiety, sum_depression)
+            SELECT user_id, DATE(created_at), COUNT(*), COALESCE(SUM(stress_score), 0),
+                   COALESCE(SUM(anxiety_score), 0), COALESCE(SUM(depression_score), 0)
+            FROM questionnaire_responses GROUP BY user_id, DATE(created_at)
+        """)
+        conn.commit()
+        cursor.execute("SELECT n FROM questionnaire_rollup_total WHERE id=1")
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _averages(n, s_stress, s_anxiety, s_depression):
+    n = int(n or 0)
+    if not n:
+        return {"avg_stress": 0.0, "avg_anxiety": 0.0, "avg_depression": 0.0, "total_entries": 0}
+    return {
+        "avg_stress": float(s_stress) / n,
+        "avg_anxiety": float(s_anxiety) / n,
+        "avg_depression": float(s_depression) / n,
+        "total_entries": n,
+    }
+
+
+def totals(cursor):
+    cursor.execute("SELECT n, sum_stress, sum_anxiety, sum_depression FROM questionnaire_rollup_total WHERE id=1")
+    row = cursor.fetchone()
+    return _averages(*row) if row else _averages(0, 0, 0, 0)
+
+
+def series(cursor, start, end, bucket="day", user_id=None):
+    """
+    Averages per hour/day/week between start (inclusive) and end (exclusive).
+    Reads only rollup rows, never questionnaire_responses.
+    """
+    if user_id is not None:
+        if bucket == "hour":
+            raise ValueError("per-user rollups are daily; use bucket=day or week")
+        expr = BUCKETS[bucket].replace("bucket_start", "day")
+        # whole days: a partial last day is included
+        end_day = end.date() if end.time() == datetime.time() else end.date() + datetime.timedelta(days=1)
+        cursor.execute(f"""
+            SELECT {expr} AS bucket, SUM(n), SUM(sum_stress), SUM(sum_anxiety), SUM(sum_depression)
+            FROM questionnaire_rollup_user_daily
+            WHERE user_id=%s AND day >= %s AND day < %s
+            GROUP BY bucket ORDER BY bucket
+        """, (user_id, start.date(), end_day))
+    else:
+        expr = BUCKETS[bucket]
+        cursor.execute(f"""
+            SELECT {expr} AS bucket, SUM(n), SUM(sum_stress), SUM(sum_anxiety), SUM(sum_depression)
+            FROM questionnaire_rollup_hourly
+            WHERE bucket_start >= %s AND bucket_start < %s
+            GROUP BY bucket ORDER BY bucket
+        """, (start, end))
+    out = []
+    for b, n, s1, s2, s3 in cursor.fetchall():
+        point = _averages(n, s1, s2, s3)
+        point["bucket"] = b.isoformat() if hasattr(b, "isoformat") else str(b)
+        out.append(point)
+    return out
@@ -0,0 +1,135 @@
+import json
+import operator
+import os
+import re
+import threading
+import time
+
+_OPS = {"gte": operator.ge, "gt": operator.gt, "lt": operator.lt, "lte": operator.le, "eq": operator.eq}
+
+
+def _trie_regex(words):
+    """
+    One regex for all keywords, factored as a character trie so the engine
+    branches on the next character instead of trying every keyword in turn.
+    Matches whole words only.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        ends_here = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not ends_here else "(?:" + "|".join(branches) + ")"
+        return body + "?" if ends_here else body
+
+    return re.compile(r"(?<!\w)" + build(trie) + r"(?!\w)")
+
+
+class KeywordMatcher:
+    """
+    Maps keywords to (priority, value). match() scans the text once and
+    returns the value of the highest-priority (lowest number) keyword found.
+    """
+
+    def __init__(self, groups):
+        self._lookup = {}
+        for priority, (keywords, value) in enumerate(groups):
+            for kw in keywords:
+                kw = kw.lower()
+                if kw not in self._lookup:
+                    self._lookup[kw] = (priority, value)
+        self._regex = _trie_regex(self._lookup) if self._lookup else None
+
+    def match(self, text):
+        if not self._regex:
+            return None
+        best = None
+        for m in self._regex.finditer(text.lower()):
+            hit = self._lookup[m.group(0)]
+            if best is None or hit[0] < best[0]:
+                best = hit
+                if best[0] == 0:
+                    break
+        return best[1] if best else None
+
+
+class ThresholdRule:
+    def __init__(self, when, tip):
+        self.tip = tip
+        self.checks = [(field, _OPS[op], float(value))
+                       for field, bounds in when.items() for op, value in bounds.items()]
+
+    def applies(self, scores):
+        return all(op(scores[field], value) for field, op, value in self.checks)
+
+
+class RuleBook:
+    """Compiled form of data/suggestion_rules.json."""
+
+    def __init__(self, data):
+        self.keywords = KeywordMatcher([(g["keywords"], g["suggestion"]) for g in data["chat_keywords"]])
+        self.score_ranges = [(r["max"], r["suggestion"]) for r in data["chat_score_ranges"]]
+        self.questionnaire = [ThresholdRule(r["when"], r["tip"]) for r in data["questionnaire"]]
+        self.questionnaire_default = data["questionnaire_default"]
+
+    def chat_suggestion(self, score, text):
+        suggestion = self.keywords.match(text or "")
+        if suggestion:
+            return suggestion
+        for upper, suggestion in self.score_ranges:
+            if upper is None or score <= upper:
+                return suggestion
+        return None
+
+    def questionnaire_tips(self, scores):
+        tips = [r.tip for r in self.questionnaire if r.applies(scores)]
+        return tips or [self.questionnaire_default]
+
+
+class RuleSet:
+    """
+    Loads a RuleBook from a JSON file and reloads it when the file's mtime
+    changes (checked at most every check_interval seconds). A broken edit is
+    reported and the previous rules stay in effect.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._book = self._load()
+        self._checked = time.monotonic()
+        self.reloads = 0
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            return RuleBook(json.load(f))
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    self._maybe_reload()
+        return self._book
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            # remember the mtime even if the load fails, so a broken file is reported once per edit
+            self._mtime = mtime
+            self._book = self._load()
+            self.reloads += 1
+        except Exception as e:
+            print("⚠️ rules reload failed, keeping previous rules:", e)
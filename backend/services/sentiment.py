@@ -0,0 +1,76 @@
+import re
+import string
+import threading
+
+_PUNCT_RE = re.compile("[%s]" % re.escape(string.punctuation))
+
+
+def label_for(score):
+    if score >= 0.05:
+        return "POSITIVE"
+    elif score <= -0.05:
+        return "NEGATIVE"
+    return "NEUTRAL"
+
+
+class SentimentScorer:
+    """
+    Wraps a VADER SentimentIntensityAnalyzer for /api/chat and /api/chat/batch.
+
+    VADER has no vectorised API, so there is no true bulk scoring here: every
+    message that needs it still goes through sia.polarity_scores on its own.
+    What is saved is work VADER would throw away. The lexicon keys are
+    compiled into one frozenset up front, and a message whose tokens (raw, or
+    with punctuation stripped) never hit the lexicon can only score compound
+    0.0, so it skips the analyzer. score_many() additionally scores identical
+    messages in a batch once. Compound scores (and so labels) are identical to
+    calling polarity_scores per message; benchmarks/sentiment_bench.py checks
+    that.
+    """
+
+    def __init__(self, sia):
+        self.sia = sia
+        self.lexicon = frozenset(k for k in sia.lexicon if k == k.lower()) if sia else frozenset()
+        self.counters = {"scored": 0, "lexicon_skips": 0, "duplicates": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def may_carry_sentiment(self, text):
+        lexicon = self.lexicon
+        for token in text.split():
+            low = token.lower()
+            if low in lexicon:
+                return True
+            if low.strip(string.punctuation) in lexicon or _PUNCT_RE.sub("", low) in lexicon:
+                return True
+        return False
+
+    def compound(self, text):
+        self._count("scored")
+        if not self.may_carry_sentiment(text):
+            # every valence would be 0, which VADER normalises to compound 0.0
+            self._count("lexicon_skips")
+            return 0.0
+        return self.sia.polarity_scores(text).get("compound", 0.0)
+
+    def score(self, text):
+        """(compound score, label) for one message, same as the /api/chat path."""
+        if not self.sia:
+            return 0.0, "NEUTRAL"
+        score = self.compound(text)
+        return score, label_for(score)
+
+    def score_many(self, texts):
+        """score() for each text, in order; repeated texts are only scored once."""
+        results = {}
+        out = []
+        for text in texts:
+            if text in results:
+                self._count("duplicates")
+            else:
+                results[text] = self.score(text)
+            out.append(results[text])
+        return out
@@ -0,0 +1,237 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import threading
+import time
+
+from flask import send_file
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+# Pre-compressed at build time (everything else is served as-is)
+COMPRESSIBLE = {".html", ".js", ".css", ".svg", ".json", ".txt"}
+# Renamed to name.<hash>.ext at build time and cached forever by browsers;
+# HTML keeps its name because users navigate to it directly
+FINGERPRINTED = {".js", ".css"}
+SKIP_DIRS = {"resources"}  # large media, served by the range-aware resource route
+MANIFEST = "manifest.json"
+MIN_COMPRESS_BYTES = 256
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_REF_RE = re.compile(r"""(\b(?:src|href)\s*=\s*["'])([^"'#?]+)(["'])""", re.IGNORECASE)
+
+
+# -----------------------------
+# build step (flask build-static)
+# -----------------------------
+def _walk(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        if rel_dir == ".":
+            rel_dir = ""
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            yield posixpath.join(*(rel_dir.split(os.sep) if rel_dir else []), name)
+
+
+def _fingerprint(rel, data):
+    stem, ext = posixpath.splitext(rel)
+    return "%s.%s%s" % (stem, hashlib.sha1(data).hexdigest()[:10], ext)
+
+
+def _write_variants(out_dir, rel, data):
+    path = os.path.join(out_dir, *rel.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if posixpath.splitext(rel)[1] not in COMPRESSIBLE or len(data) < MIN_COMPRESS_BYTES:
+        return
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def _rewrite_refs(rel, text, manifest):
+    """Point src=/href= attributes of an HTML file at the fingerprinted names."""
+    base = posixpath.dirname(rel)
+
+    def sub(m):
+        ref = m.group(2)
+        if "://" in ref or ref.startswith("//") or ref.startswith("data:"):
+            return m.group(0)
+        target = ref.lstrip("/") if ref.startswith("/") else posixpath.normpath(posixpath.join(base, ref))
+        hashed = manifest.get(target)
+        if not hashed:
+            return m.group(0)
+        new = "/" + hashed if ref.startswith("/") else posixpath.relpath(hashed, base or ".")
+        return m.group(1) + new + m.group(3)
+
+    return _REF_RE.sub(sub, text)
+
+
+def build(static_dir, out_dir):
+    """
+    Write the served copy of static_dir to out_dir: JS/CSS fingerprinted,
+    HTML rewritten to reference them, gzip (and brotli, if installed)
+    variants next to each text asset, and a manifest of logical -> built
+    names. Returns the manifest.
+    """
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    files = sorted(_walk(static_dir))
+    manifest = {}
+    for rel in files:
+        if posixpath.splitext(rel)[1] in FINGERPRINTED:
+            with open(os.path.join(static_dir, *rel.split("/")), "rb") as f:
+                data = f.read()
+            manifest[rel] = _fingerprint(rel, data)
+            _write_variants(out_dir, manifest[rel], data)
+    for rel in files:
+        if rel in manifest:
+            continue
+        with open(os.path.join(static_dir, *rel.split("/")), "rb") as f:
+            data = f.read()
+        if rel.endswith(".html"):
+            data = _rewrite_refs(rel, data.decode("utf-8"), manifest).encode("utf-8")
+        manifest[rel] = rel
+        _write_variants(out_dir, rel, data)
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+# -----------------------------
+# serving
+# -----------------------------
+def accepted_encodings(header):
+    """Encodings the client accepts (q > 0), from an Accept-Encoding header."""
+    accepted = set()
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if token and q > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """
+    Serves static files from an in-memory table built by walking the tree
+    once: path -> (file, size, mtime, mimetype, etag, encoded variants,
+    Cache-Control). Requests never stat the filesystem.
+
+    With a build directory (flask build-static) the built copy is served:
+    fingerprinted JS/CSS get immutable caching, everything else is
+    revalidated by ETag, and .br/.gz variants are picked by Accept-Encoding.
+    Without one, static_dir is served as-is and rescanned every
+    rescan_interval seconds so edits show up during development.
+    """
+
+    def __init__(self, static_dir, build_dir=None, rescan_interval=5.0):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._table = {}
+        self._scanned = float("-inf")
+        self.built = False
+        self.counters = {"served": 0, "not_modified": 0, "br": 0, "gzip": 0, "misses": 0, "scans": 0}
+
+    def _entry(self, path, cache_control):
+        st = os.stat(path)
+        variants = {}
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if os.path.exists(path + suffix):
+                variants[encoding] = path + suffix
+        return {
+            "path": path,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "mimetype": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "etag": "%x-%x" % (int(st.st_mtime * 1000), st.st_size),
+            "variants": variants,
+            "cache_control": cache_control,
+        }
+
+    def scan(self):
+        table = {}
+        manifest_path = os.path.join(self.build_dir, MANIFEST) if self.build_dir else None
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            for logical, built in manifest.items():
+                path = os.path.join(self.build_dir, *built.split("/"))
+                table[built] = self._entry(path, IMMUTABLE if built != logical else REVALIDATE)
+                if built != logical:
+                    # the unhashed name still works, but must be revalidated
+                    table[logical] = self._entry(path, REVALIDATE)
+            self.built = True
+        else:
+            for rel in _walk(self.static_dir):
+                table[rel] = self._entry(os.path.join(self.static_dir, *rel.split("/")), REVALIDATE)
+            self.built = False
+        with self._lock:
+            self._table = table
+            self._scanned = time.monotonic()
+            self.counters["scans"] += 1
+
+    def lookup(self, filename):
+        if time.monotonic() - self._scanned >= self.rescan_interval and not (self.built and self._table):
+            self.scan()
+        entry = self._table.get(filename.lstrip("/"))
+        if entry is None:
+            with self._lock:
+                self.counters["misses"] += 1
+        return entry
+
+    def serve(self, filename, accept_encoding=None):
+        """Response for filename, or None when it isn't a known static file."""
+        entry = self.lookup(filename)
+        if entry is None:
+            return None
+        path, encoding = entry["path"], None
+        accepted = accepted_encodings(accept_encoding)
+        for candidate in ("br", "gzip"):
+            if candidate in entry["variants"] and candidate in accepted:
+                path, encoding = entry["variants"][candidate], candidate
+                break
+        resp = send_file(path, mimetype=entry["mimetype"], conditional=True,
+                         etag=entry["etag"] + ("-" + encoding if encoding else ""),
+                         last_modified=entry["mtime"])
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        if entry["variants"]:
+            resp.headers["Vary"] = "Accept-Encoding"
+        resp.headers["Cache-Control"] = entry["cache_control"]
+        with self._lock:
+            self.counters["served"] += 1
+            if resp.status_code == 304:
+                self.counters["not_modified"] += 1
+            if encoding:
+                self.counters[encoding] += 1
+        return resp
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["files"] = len(self._table)
+        data["built"] = self.built
+        return data
@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class SqliteSharedCache:
+    """
+    Cross-process key/value store with expiry in a local SQLite file: the
+    stand-in for a shared cache (Redis/memcached) when several gunicorn
+    workers run on one host. Values are JSON; the file is created 0600
+    because user records include password hashes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _conn(self):
+        if self._pid != os.getpid():
+            # one connection per process; sqlite handles locking between them
+            fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600)
+            os.close(fd)
+            conn = sqlite3.connect(self.path, timeout=1.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self._db = conn
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn().execute("SELECT value, expires FROM cache WHERE key=?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return _MISSING
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?,?,?)",
+                         (key, json.dumps(value), time.time() + ttl))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                # negative entries for random emails would otherwise pile up
+                conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+    def delete(self, *keys):
+        with self._lock:
+            self._conn().executemany("DELETE FROM cache WHERE key=?", [(k,) for k in keys])
+
+
+class UserCache:
+    """
+    TTL + LRU cache of user records keyed by "email:<addr>" / "username:<name>".
+    invalidate() must be called when a user is added or changed.
+
+    Unknown keys are cached too (as None) so floods of logins /
+    forgot-password requests for emails that don't exist stop reaching MySQL.
+    With a shared backend they live there for negative_ttl seconds. Without
+    one they stay in the per-process LRU for only local_negative_ttl seconds:
+    a signup only invalidates its own worker, so that is how long the others
+    may keep answering "no such user".
+
+    A load that was already running when invalidate() was called is returned
+    to its caller but not stored, so it can't put the pre-change record back.
+    """
+
+    def __init__(self, ttl=300.0, negative_ttl=60.0, max_entries=10000, shared=None, local_negative_ttl=5.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local_negative_ttl = local_negative_ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (expires, record or None)
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by invalidate()
+        self.counters = {"hits": 0, "negative_hits": 0, "shared_hits": 0, "misses": 0,
+                         "invalidations": 0, "shared_errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _local_set(self, key, record, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, record)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _shared_call(self, method, *args):
+        try:
+            return getattr(self.shared, method)(*args)
+        except Exception as e:
+            print("⚠️ shared user cache error:", e)
+            self._count("shared_errors")
+            return _MISSING
+
+    def get_or_load(self, key, loader):
+        record = self._local_get(key)
+        if record is not _MISSING:
+            self._count("hits" if record is not None else "negative_hits")
+            return record
+        if self.shared is not None:
+            record = self._shared_call("get", key)
+            if record is not _MISSING:
+                self._count("shared_hits" if record is not None else "negative_hits")
+                if record is not None:
+                    self._local_set(key, record, self.ttl)
+                return record
+
+        self._count("misses")
+        with self._lock:
+            generation = self._generation
+        record = loader()
+        with self._lock:
+            stale = generation != self._generation
+        if stale:
+            return record
+        if record is None:
+            if self.shared is not None:
+                self._shared_call("set", key, None, self.negative_ttl)
+            elif self.local_negative_ttl > 0:
+                self._local_set(key, None, min(self.local_negative_ttl, self.negative_ttl))
+            return record
+        if self.shared is not None:
+            self._shared_call("set", key, record, self.ttl)
+        self._local_set(key, record, self.ttl)
+        return record
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+            self.counters["invalidations"] += 1
+        if self.shared is not None:
+            self._shared_call("delete", *keys)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["entries"] = len(self._entries)
+        data["shared"] = self.shared is not None
+        return data
+
+
+def email_key(email):
+    return "email:" + (email or "").lower()
+
+
+def username_key(username):
+    return "username:" + (username or "").lower()
+
+
+def user_cache_from_env():
+    shared_path = os.getenv("USER_CACHE_SHARED")  # e.g. /tmp/mindease_user_cache.sqlite
+    return UserCache(
+        ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+        negative_ttl=float(os.getenv("USER_CACHE_NEGATIVE_TTL", "60")),
+        local_negative_ttl=float(os.getenv("USER_CACHE_LOCAL_NEGATIVE_TTL", "5")),
+        max_entries=int(os.getenv("USER_CACHE_SIZE", "10000")),
+        shared=SqliteSharedCache(shared_path) if shared_path else None,
+    )
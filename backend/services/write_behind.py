@@ -0,0 +1,317 @@
+import atexit
+import datetime
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"__dt__": value.isoformat()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "__dt__" in value:
+        return datetime.datetime.fromisoformat(value["__dt__"])
+    return value
+
+
+def is_data_error(exc):
+    """
+    True when the rows themselves were rejected (FK/unique violation, bad
+    value), as opposed to the database being unreachable. Checked by the
+    DB-API exception names so any driver's IntegrityError/DataError counts
+    (mysql.connector.errors.IntegrityError, sqlite3.IntegrityError, ...).
+    """
+    return any(cls.__name__ in ("IntegrityError", "DataError") for cls in type(exc).__mro__)
+
+
+class WriteBehindBuffer:
+    """
+    Takes INSERTs off the request path. enqueue() drops a row into a bounded
+    in-process queue; a background writer wakes every flush_interval seconds
+    (or as soon as max_batch rows are waiting), groups rows per table into one
+    executemany (a multi-row INSERT with mysql-connector) and commits them in
+    a single transaction.
+
+    When the DB is unreachable, or the queue is full, rows are appended to a
+    per-process spill file and replayed once the DB answers again. When the
+    DB rejects the data instead, the batch is retried row by row and rows
+    that still fail go to a dead-letter file (dead_letter-<pid>.jsonl, never
+    replayed), so one bad row can't hold back the rest. close() flushes
+    everything that is left (registered with atexit).
+    """
+
+    def __init__(self, get_connection, tables, spill_dir, flush_interval=0.5, max_batch=500,
+                 queue_size=10000, enabled=True, hooks=None):
+        self._get_connection = get_connection
+        self.tables = tables  # table name -> INSERT statement
+        # table name -> fn(cursor, rows), run in the same transaction as the insert
+        self.hooks = hooks or {}
+        self.spill_dir = spill_dir
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._pid = None
+        self._metrics = {
+            "enqueued": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "flush_seconds_total": 0.0,
+            "flush_seconds_max": 0.0,
+            "last_flush_seconds": 0.0,
+            "last_flush_rows": 0,
+            "spilled_rows": 0,
+            "replayed_rows": 0,
+            "dead_rows": 0,
+        }
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # fresh queue/thread in every process (gunicorn forks after import)
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._wake = threading.Event()
+            self._stopping = False
+            self._writer = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def close(self, timeout=10.0):
+        """Stop the writer and flush whatever is still queued."""
+        if self._pid != os.getpid():
+            return
+        self._stopping = True
+        self._wake.set()
+        self._writer.join(timeout)
+
+    # -----------------------------
+    # producer side
+    # -----------------------------
+    def enqueue(self, table, row):
+        if table not in self.tables:
+            raise KeyError(table)
+        if not self.enabled:
+            self._write({table: [tuple(row)]})
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((table, tuple(row)))
+        except queue.Full:
+            # never block the request; the row is kept on disk and replayed later
+            self._spill({table: [tuple(row)]})
+        else:
+            with self._lock:
+                self._metrics["enqueued"] += 1
+            if self._queue.qsize() >= self.max_batch:
+                self._wake.set()
+
+    # -----------------------------
+    # writer side
+    # -----------------------------
+    def _drain(self):
+        grouped, count = {}, 0
+        while count < self.max_batch:
+            try:
+                table, row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            grouped.setdefault(table, []).append(row)
+            count += 1
+        return grouped, count
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while True:
+                grouped, count = self._drain()
+                if not count:
+                    break
+                self._flush(grouped, count)
+            self._replay_spill()
+            if self._stopping and self._queue.empty():
+                return
+
+    def _write(self, grouped):
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            for table, rows in grouped.items():
+                cursor.executemany(self.tables[table], rows)
+                if table in self.hooks:
+                    self.hooks[table](cursor, rows)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def _write_each(self, grouped, requeue=False):
+        """
+        Write rows one transaction each after a data error. Rejected rows are
+        dead-lettered; if the DB goes away meanwhile, the rest is spilled.
+        Returns the number of rows written.
+        """
+        written = 0
+        items = [(table, row) for table, rows in grouped.items() for row in rows]
+        for i, (table, row) in enumerate(items):
+            try:
+                self._write({table: [row]})
+                written += 1
+            except Exception as e:
+                if not is_data_error(e):
+                    rest = {}
+                    for t, r in items[i:]:
+                        rest.setdefault(t, []).append(r)
+                    self._spill(rest, requeue=requeue)
+                    break
+                self._dead_letter(table, row, e)
+        return written
+
+    def _flush(self, grouped, count):
+        started = time.perf_counter()
+        try:
+            self._write(grouped)
+        except Exception as e:
+            with self._lock:
+                self._metrics["flush_errors"] += 1
+            if is_data_error(e):
+                print("⚠️ write-behind batch rejected, retrying %d rows one by one:" % count, e)
+                count = self._write_each(grouped)
+            else:
+                print("⚠️ write-behind flush failed, spilling %d rows:" % count, e)
+                self._spill(grouped)
+                return False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            m = self._metrics
+            m["flushes"] += 1
+            m["flushed_rows"] += count
+            m["flush_seconds_total"] += elapsed
+            m["flush_seconds_max"] = max(m["flush_seconds_max"], elapsed)
+            m["last_flush_seconds"] = elapsed
+            m["last_flush_rows"] = count
+        return True
+
+    # -----------------------------
+    # spill file
+    # -----------------------------
+    def _spill_path(self, pid=None):
+        return os.path.join(self.spill_dir, "write_behind-%d.jsonl" % (pid or os.getpid()))
+
+    def _spill(self, grouped, requeue=False):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        lines = [json.dumps({"table": t, "row": [_encode(v) for v in row]}) + "\n"
+                 for t, rows in grouped.items() for row in rows]
+        with self._spill_lock:
+            with open(self._spill_path(), "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        if not requeue:
+            with self._lock:
+                self._metrics["spilled_rows"] += len(lines)
+
+    def _dead_letter(self, table, row, error):
+        print("⚠️ write-behind dropped a row rejected by the DB (see dead_letter file):", table, error)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        line = json.dumps({"table": table, "row": [_encode(v) for v in row], "error": str(error),
+                           "at": time.time()}) + "\n"
+        with self._spill_lock:
+            with open(os.path.join(self.spill_dir, "dead_letter-%d.jsonl" % os.getpid()), "a", encoding="utf-8") as f:
+                f.write(line)
+        with self._lock:
+            self._metrics["dead_rows"] += 1
+
+    def _spill_files(self):
+        # our own file, plus files left behind by workers that have exited
+        files = []
+        for path in glob.glob(os.path.join(self.spill_dir, "write_behind-*.jsonl")):
+            try:
+                pid = int(os.path.basename(path)[len("write_behind-"):-len(".jsonl")])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not _pid_alive(pid):
+                files.append(path)
+        return files
+
+    def _replay_spill(self):
+        for path in self._spill_files():
+            claimed = path + ".replay-%d" % os.getpid()
+            with self._spill_lock:
+                try:
+                    os.rename(path, claimed)
+                except OSError:
+                    continue  # another worker claimed it
+            items = []
+            with open(claimed, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    items.append((item["table"], tuple(_decode(v) for v in item["row"])))
+            # replayed in max_batch chunks so a large file isn't one huge transaction
+            for start in range(0, len(items), self.max_batch):
+                grouped = {}
+                for table, row in items[start:start + self.max_batch]:
+                    grouped.setdefault(table, []).append(row)
+                try:
+                    self._write(grouped)
+                    written = len(items[start:start + self.max_batch])
+                except Exception as e:
+                    if not is_data_error(e):
+                        # DB still down: keep the unwritten rows for the next cycle
+                        self._requeue_claimed(path, claimed, items, start)
+                        return
+                    written = self._write_each(grouped, requeue=True)
+                with self._lock:
+                    self._metrics["replayed_rows"] += written
+            os.remove(claimed)
+
+    def _requeue_claimed(self, path, claimed, items, start):
+        with self._spill_lock:
+            if start == 0 and not os.path.exists(path):
+                # nothing was written: hand the file back as is (no rewrite, no fsync)
+                os.rename(claimed, path)
+                return
+        rest = {}
+        for table, row in items[start:]:
+            rest.setdefault(table, []).append(row)
+        self._spill(rest, requeue=True)
+        os.remove(claimed)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._metrics)
+        data["queue_depth"] = self._queue.qsize() if self._pid == os.getpid() else 0
+        data["queue_size"] = self.queue_size
+        data["flush_interval"] = self.flush_interval
+        data["enabled"] = self.enabled
+        data["spill_files"] = len(glob.glob(os.path.join(self.spill_dir, "write_behind-*.jsonl")))
+        data["dead_letter_files"] = len(glob.glob(os.path.join(self.spill_dir, "dead_letter-*.jsonl")))
+        return data
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,49 @@
+"""
+Risk prediction: per-row loop vs. the batch API.
+
+    python benchmarks/inference_bench.py [rows]
+
+Scores the same synthetic cohort with predict_from_features in a loop
+(one model call per row), with predict_many (one vectorised call per
+chunk) and with predict_sharded (chunks spread over worker processes).
+Uses ml_model/trained_model.joblib when present, the rule-based fallback
+otherwise.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services import inference
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0, 4, size=(n, 5))
+    model = inference.get_model()
+    print(f"rows={n} model={'joblib' if model is not None else 'rule-based fallback'}")
+
+    loop, t_loop = timed(lambda: [inference.predict_from_features(list(row)) for row in X])
+    batch, t_batch = timed(lambda: inference.predict_many(X))
+    rows_iter, t_iter = timed(lambda: inference.predict_many(map(list, X)))
+    sharded, t_sharded = timed(lambda: np.concatenate(list(inference.predict_sharded(X, workers=4))))
+    assert list(batch) == list(loop) == list(rows_iter) == list(sharded)
+
+    print(f"{'method':<22} {'seconds':>8} {'rows/s':>12}")
+    for name, t in (("per-row loop", t_loop), ("predict_many (array)", t_batch),
+                    ("predict_many (rows)", t_iter), ("predict_sharded x4", t_sharded)):
+        print(f"{name:<22} {t:>8.3f} {n / t:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
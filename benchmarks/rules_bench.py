@@ -0,0 +1,50 @@
+"""
+Keyword matching cost vs. number of keywords.
+
+    python benchmarks/rules_bench.py
+
+Compares the old approach (one `any(word in text ...)` scan per keyword
+group) with the compiled KeywordMatcher used by get_suggestion. The old
+approach grows linearly with the keyword count; the compiled matcher stays
+roughly flat because it walks the text once.
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.rules import KeywordMatcher
+
+
+def random_word(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+
+
+def naive(groups, text):
+    text = text.lower()
+    for keywords, value in groups:
+        if any(word in text for word in keywords):
+            return value
+    return None
+
+
+def main():
+    rng = random.Random(42)
+    text = " ".join(random_word(rng) for _ in range(40)) + " I feel so tired today"
+    print(f"{'keywords':>9} {'naive us':>10} {'compiled us':>12}")
+    for total in (20, 100, 1000, 5000, 20000):
+        groups = [([random_word(rng) for _ in range(total // 4)], f"group{g}") for g in range(4)]
+        groups[-1][0].append("tired")
+        matcher = KeywordMatcher(groups)
+        assert matcher.match(text) == naive(groups, text) == "group3"
+        n = 200
+        t_naive = timeit.timeit(lambda: naive(groups, text), number=n) / n * 1e6
+        t_compiled = timeit.timeit(lambda: matcher.match(text), number=n) / n * 1e6
+        print(f"{total:>9} {t_naive:>10.1f} {t_compiled:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Chat sentiment: per-message VADER vs. SentimentScorer.
+
+    python benchmarks/sentiment_bench.py [messages]
+
+Scores the same synthetic chat log three ways: the original /api/chat
+computation (sia.polarity_scores per message, then the >= 0.05 / <= -0.05
+label cut-offs), SentimentScorer.score per message (today's /api/chat) and
+SentimentScorer.score_many (/api/chat/batch), and checks that all three give
+the same compound score and label for every message. The log mixes lexicon
+words, plain words, negations, "but", caps, punctuation and repeats.
+Needs the NLTK vader_lexicon (nltk.download("vader_lexicon")).
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from backend.services.sentiment import SentimentScorer
+
+PLAIN = ["today", "went", "to", "the", "class", "and", "then", "home", "with", "my", "friend",
+         "exam", "tomorrow", "morning", "bus", "phone", "dinner", "kind", "of", "very", "least"]
+MODIFIERS = ["not", "never", "but", "extremely", "barely", "at"]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def chat_reference(sia, text):
+    # what /api/chat returned before SentimentScorer existed
+    score = sia.polarity_scores(text).get("compound", 0.0)
+    if score >= 0.05:
+        return score, "POSITIVE"
+    elif score <= -0.05:
+        return score, "NEGATIVE"
+    return score, "NEUTRAL"
+
+
+def make_messages(sia, n, rng):
+    lexicon = sorted(k for k in sia.lexicon if k.isalpha())
+    messages = []
+    for _ in range(n):
+        if messages and rng.random() < 0.2:
+            messages.append(rng.choice(messages))  # repeated message
+            continue
+        words = []
+        for _ in range(rng.randint(3, 20)):
+            r = rng.random()
+            word = rng.choice(lexicon) if r < 0.1 else rng.choice(MODIFIERS) if r < 0.2 else rng.choice(PLAIN)
+            if rng.random() < 0.05:
+                word = word.upper()
+            words.append(word)
+        messages.append(" ".join(words) + rng.choice(["", ".", "!", "!!!", "?", " :)", " :("]))
+    return messages
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    sia = SentimentIntensityAnalyzer()
+    messages = make_messages(sia, n, random.Random(42))
+
+    reference, t_ref = timed(lambda: [chat_reference(sia, m) for m in messages])
+    scorer = SentimentScorer(sia)
+    single, t_single = timed(lambda: [scorer.score(m) for m in messages])
+    batch, t_batch = timed(lambda: SentimentScorer(sia).score_many(messages))
+    assert single == reference, "SentimentScorer.score differs from the /api/chat reference"
+    assert batch == reference, "SentimentScorer.score_many differs from the /api/chat reference"
+
+    print(f"messages={n} skipped={scorer.counters['lexicon_skips']}")
+    print(f"{'method':<24} {'seconds':>8} {'msgs/s':>12}")
+    for name, t in (("polarity_scores loop", t_ref), ("scorer.score loop", t_single),
+                    ("scorer.score_many", t_batch)):
+        print(f"{name:<24} {t:>8.3f} {n / t:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
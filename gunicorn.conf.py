@@ -0,0 +1,26 @@
+import os
+import threading
+
+# gthread keeps long-lived peer support streams from pinning a whole worker;
+# at most PEER_STREAM_MAX of the threads (default threads // 4) may hold one
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# PRELOAD_MODELS=1 imports the app (and loads VADER + the joblib model) once
+# in the master; forked workers then share those pages copy-on-write.
+preload_app = os.getenv("PRELOAD_MODELS") == "1"
+
+
+def post_worker_init(worker):
+    # WARMUP_EMOTION=1 starts each worker's emotion process pool in the
+    # background so the first /api/emotion request doesn't pay for it.
+    if os.getenv("WARMUP_EMOTION") != "1":
+        return
+    import app
+    threading.Thread(target=app.warm_up_models, args=(["emotion"],), daemon=True).start()
+
+
+def worker_exit(server, worker):
+    # drain queued chat/questionnaire rows before the worker goes away
+    import app
+    app.WRITE_BEHIND.close()
@@ -2,6 +2,7 @@
 
 // ----- Local fallback storage -----
 const LOCAL_HISTORY_KEY = "mhs_local_history_v1";
+const HISTORY_SINCE_KEY = "mhs_history_since_v1";
 function saveLocalHistory(items){ try{ localStorage.setItem(LOCAL_HISTORY_KEY, JSON.stringify(items)); }catch(e){} }
 function loadLocalHistory(){ try{ return JSON.parse(localStorage.getItem(LOCAL_HISTORY_KEY) || "[]"); }catch(e){ return []; } }
 
@@ -48,7 +49,7 @@ document.addEventListener("DOMContentLoaded", function(){
   if(openChatBtn) openChatBtn.addEventListener("click", () => window.location.href="/api/analyze-sentimentbot/index.html");
 
   if(clearHistoryBtn) clearHistoryBtn.addEventListener("click", ()=>{
-    if(confirm("Clear local history?")){ saveLocalHistory([]); renderHistory([]); updateCharts([]); }
+    if(confirm("Clear local history?")){ saveLocalHistory([]); localStorage.removeItem(HISTORY_SINCE_KEY + ":" + localStorage.getItem("user_id")); renderHistory([]); updateCharts([]); }
   });
 
   if(exportHistoryBtn){
@@ -142,19 +143,34 @@ function getSuggestionLevel(score){
 // ---- History load ----
 async function initHistoryAndCharts(){
   let merged = loadLocalHistory();
+  const uid = localStorage.getItem("user_id");
   try{
-    const res = await fetch("/api/history");
-    if(res.ok){
-      const server = await res.json();
-      if(Array.isArray(server) && server.length){
-        merged = server.map(x=>({
-          text:x.text||x.input||"",
-          reply:x.reply||"",
-          label:x.label||"neutral",
-          score:typeof x.score==="number"?x.score:0,
-          suggestion:x.suggestion||"",
-          timestamp:x.timestamp||(new Date()).toISOString()
-        }));
+    if(uid){
+      // only ask for rows newer than the last sync; older ones are already stored locally
+      const sinceKey = HISTORY_SINCE_KEY + ":" + uid;
+      let since = localStorage.getItem(sinceKey);
+      const url = "/api/history?user_id=" + encodeURIComponent(uid);
+      let res = await fetch(since ? url + "&since=" + encodeURIComponent(since) : url);
+      if(since && res.ok && res.headers.get("X-Next-Since")){
+        // more new rows than one page: too far behind, reload the latest page instead
+        since = null;
+        res = await fetch(url);
+      }
+      if(res.ok){
+        const server = await res.json();
+        if(Array.isArray(server) && server.length){
+          const rows = server.map(x=>({
+            text:x.text||x.input||"",
+            reply:x.reply||"",
+            label:x.label||"neutral",
+            score:typeof x.score==="number"?x.score:0,
+            suggestion:x.suggestion||"",
+            timestamp:x.timestamp||x.created_at||(new Date()).toISOString()
+          }));
+          merged = since ? rows.concat(merged) : rows;
+        }
+        const latest = res.headers.get("X-Latest-Id");
+        if(latest) localStorage.setItem(sinceKey, latest);
       }
     }
   }catch(e){}